@@ -1,114 +1,153 @@
 import argparse
-import boto3
 import logging
 from botocore.exceptions import ClientError
-from auth import aws_client
+from task4_bonus.clients import get_client
+from task4_bonus.profiling import add_profile_arguments, profile_calls
 from vpc import (
-    create_vpc, add_name_tag, get_or_set_igw,
+    create_vpc, get_or_set_igw,
     create_route_table_without_route, create_subnet,
-    associate_route_table_to_subnet, create_route_table_with_route,
+    associate_route_table_to_subnet, add_route_to_igw,
     enable_auto_public_ips
 )
 from ec2 import (
     create_key_pair, create_security_group, add_ssh_access_sg, run_ec2
 )
 from rds import (
-    create_db_subnet_group, create_rds_security_group, create_db_instance
+    create_db_subnet_group, create_rds_security_group, add_mysql_access_sg, create_db_instance
 )
+from stack_graph import run_graph, log_timings
+from teardown import teardown
+from journal import Journal
 
 logging.basicConfig(level=logging.INFO)
 
-def rollback(resources):
+def rollback(resources, region=None, max_workers=8, journal=None):
     logging.warning("Initiating rollback...")
-    ec2 = boto3.client('ec2')
-    rds = boto3.client('rds')
-
-    for resource in reversed(resources):
-        try:
-            r_type, r_id = resource
-            if r_type == 'instance':
-                ec2.terminate_instances(InstanceIds=[r_id])
-                logging.info(f"Terminated EC2 instance: {r_id}")
-            elif r_type == 'sg':
-                ec2.delete_security_group(GroupId=r_id)
-                logging.info(f"Deleted Security Group: {r_id}")
-            elif r_type == 'subnet':
-                ec2.delete_subnet(SubnetId=r_id)
-                logging.info(f"Deleted Subnet: {r_id}")
-            elif r_type == 'rtb':
-                ec2.delete_route_table(RouteTableId=r_id)
-                logging.info(f"Deleted Route Table: {r_id}")
-            elif r_type == 'igw':
-                igw_id, vpc_id = r_id
-                ec2.detach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
-                ec2.delete_internet_gateway(InternetGatewayId=igw_id)
-                logging.info(f"Deleted IGW: {igw_id}")
-            elif r_type == 'vpc':
-                ec2.delete_vpc(VpcId=r_id)
-                logging.info(f"Deleted VPC: {r_id}")
-            elif r_type == 'rds_subnet_group':
-                rds.delete_db_subnet_group(DBSubnetGroupName=r_id)
-                logging.info(f"Deleted RDS Subnet Group: {r_id}")
-            elif r_type == 'db_instance':
-                rds.delete_db_instance(DBInstanceIdentifier=r_id, SkipFinalSnapshot=True)
-                logging.info(f"Deleted RDS Instance: {r_id}")
-        except Exception as e:
-            logging.error(f"Failed to delete {resource}: {e}")
+    ec2 = get_client('ec2', region, max_workers)
+    rds = get_client('rds', region, max_workers)
+
+    remaining = teardown(ec2, rds, resources, max_workers=max_workers)
+    if journal:
+        journal.rollback([resource for resource in resources if resource not in remaining])
+    if remaining:
+        logging.error(f"Rollback incomplete, remaining resources: {remaining}")
+    else:
+        logging.info("Rollback complete, all resources deleted")
+    return remaining
 
 def create_bastion(args):
-    ec2_client = aws_client('ec2', args.region)
-    rds_client = aws_client('rds', args.region)
-
-    resources = []
+    ec2_client = get_client('ec2', args.region, args.workers)
+    rds_client = get_client('rds', args.region, args.workers)
+
+    journal = Journal(args.journal)
+    done, resources = journal.load()
+    subnet_group_name = "bastion-subnet-group"
+    db_identifier = "bastion-db-instance"
+
+    def once(name, fn, r_type=None, r_id=None):
+        """Run one create call of a step unless the journal says it already ran.
+
+        A step that fails halfway is resumed from its first unfinished call, so
+        nothing it already created is created twice.
+        """
+        if name in done:
+            return done[name]
+        result = fn()
+        if r_type:
+            resource = (r_type, r_id(result) if r_id else result)
+            resources.append(resource)
+            journal.resource(*resource, name)
+        journal.step(name, result)
+        done[name] = result
+        return result
+
+    def vpc(_):
+        return once('vpc:create', lambda: create_vpc(ec2_client, args.vpc_cidr, {'Name': 'bastion-vpc'}), 'vpc')
+
+    def igw(r):
+        return once('igw:attach', lambda: get_or_set_igw(ec2_client, r['vpc'], {'Name': 'bastion-igw'}), 'igw', lambda igw_id: (igw_id, r['vpc']))
+
+    def private_subnet(i, cidr):
+        def step(r):
+            name = f'private_subnet_{i}'
+            subnet_id = once(f'{name}:subnet', lambda: create_subnet(ec2_client, r['vpc'], cidr, f'private_sub_{i}', f'{args.region}a'), 'subnet')
+            rtb_id = once(f'{name}:rtb', lambda: create_route_table_without_route(ec2_client, r['vpc'], {'Name': f'bastion-private-{i}'}), 'rtb')
+            once(f'{name}:associate', lambda: associate_route_table_to_subnet(ec2_client, rtb_id, subnet_id))
+            return subnet_id
+        return step
+
+    def public_subnet(r):
+        subnet_id = once('public_subnet:subnet', lambda: create_subnet(ec2_client, r['vpc'], '10.0.2.0/24', 'public_sub_1', f'{args.region}a'), 'subnet')
+        enable_auto_public_ips(ec2_client, subnet_id, 'enable')
+        return subnet_id
+
+    def public_rtb(r):
+        rtb_id = once('public_rtb:rtb', lambda: create_route_table_without_route(ec2_client, r['vpc'], {'Name': 'bastion-public'}), 'rtb')
+        once('public_rtb:route', lambda: add_route_to_igw(ec2_client, rtb_id, r['igw']))
+        once('public_rtb:associate', lambda: associate_route_table_to_subnet(ec2_client, rtb_id, r['public_subnet']))
+        return rtb_id
+
+    def key_pair(_):
+        return once('key_pair:create', lambda: create_key_pair(ec2_client, args.key_name, args.key_dir, {'Name': args.key_name}), 'key_pair')
+
+    def ec2_sg(r):
+        sg_id = once('ec2_sg:create', lambda: create_security_group(ec2_client, "bastion-ec2-sg", "Access for bastion host", r['vpc'], {'Name': 'bastion-ec2-sg'}), 'sg')
+        add_ssh_access_sg(ec2_client, sg_id)
+        return sg_id
+
+    def instance(r):
+        return once('instance:run', lambda: run_ec2(ec2_client, r['ec2_sg'], r['public_subnet'], args.instance_name, r['key_pair']), 'instance')
+
+    def rds_subnet_group(r):
+        return once('rds_subnet_group:create', lambda: create_db_subnet_group(rds_client, subnet_group_name, [r['private_subnet_0'], r['private_subnet_1']]), 'rds_subnet_group')
+
+    def rds_sg(r):
+        sg_id = once('rds_sg:create', lambda: create_rds_security_group(ec2_client, "bastion-rds-sg", r['vpc'], {'Name': 'bastion-rds-sg'}), 'rds_sg')
+        add_mysql_access_sg(ec2_client, sg_id, r['ec2_sg'])
+        return sg_id
+
+    def db_instance(r):
+        def create():
+            return create_db_instance(rds_client, r['rds_sg'], r['rds_subnet_group'], db_identifier)['DBInstanceIdentifier']
+        return once('db_instance:create', create, 'db_instance')
+
+    steps = {
+        'vpc': ([], vpc),
+        'igw': (['vpc'], igw),
+        'private_subnet_0': (['vpc'], private_subnet(0, '10.0.0.0/24')),
+        'private_subnet_1': (['vpc'], private_subnet(1, '10.0.1.0/24')),
+        'public_subnet': (['vpc'], public_subnet),
+        'public_rtb': (['vpc', 'igw', 'public_subnet'], public_rtb),
+        'key_pair': ([], key_pair),
+        'ec2_sg': (['vpc'], ec2_sg),
+        'instance': (['ec2_sg', 'public_subnet', 'public_rtb', 'key_pair'], instance),
+        'rds_subnet_group': (['vpc', 'private_subnet_0', 'private_subnet_1'], rds_subnet_group),
+        'rds_sg': (['vpc', 'ec2_sg'], rds_sg),
+        'db_instance': (['rds_sg', 'rds_subnet_group'], db_instance),
+    }
+
+    # a step whose dependency was rolled back has to run again with the new result
+    stale = True
+    while stale:
+        stale = [name for name, (deps, _) in steps.items() if name in done and not all(dep in done for dep in deps)]
+        for name in stale:
+            for key in [key for key in done if key == name or key.startswith(f'{name}:')]:
+                del done[key]
+    if done:
+        logging.info(f"Resuming from journal {args.journal}, already finished: {sorted(done)}")
 
     try:
-        vpc_id = create_vpc(ec2_client, args.vpc_cidr)
-        resources.append(('vpc', vpc_id))
-        add_name_tag(ec2_client, vpc_id, "bastion-vpc")
-
-        igw_id = get_or_set_igw(ec2_client, vpc_id)
-        resources.append(('igw', (igw_id, vpc_id)))
-
-        private_subnets = []
-        for i, cidr in enumerate(['10.0.0.0/24', '10.0.1.0/24']):
-            subnet_id = create_subnet(ec2_client, vpc_id, cidr, f'private_sub_{i}', f'{args.region}a')
-            resources.append(('subnet', subnet_id))
-            rtb_id = create_route_table_without_route(ec2_client, vpc_id)
-            resources.append(('rtb', rtb_id))
-            associate_route_table_to_subnet(ec2_client, rtb_id, subnet_id)
-            private_subnets.append(subnet_id)
-
-        public_subnet = create_subnet(ec2_client, vpc_id, '10.0.2.0/24', 'public_sub_1', f'{args.region}a')
-        resources.append(('subnet', public_subnet))
-        pub_rtb_id = create_route_table_with_route(ec2_client, vpc_id, 'public_route', igw_id)
-        resources.append(('rtb', pub_rtb_id))
-        associate_route_table_to_subnet(ec2_client, pub_rtb_id, public_subnet)
-        enable_auto_public_ips(ec2_client, public_subnet, 'enable')
-
-        create_key_pair(ec2_client, args.key_name)
-
-        ec2_sg = create_security_group(ec2_client, "bastion-ec2-sg", "Access for bastion host", vpc_id)
-        resources.append(('sg', ec2_sg))
-        add_ssh_access_sg(ec2_client, ec2_sg)
-
-        instance_id = run_ec2(ec2_client, ec2_sg, public_subnet, args.instance_name)
-        resources.append(('instance', instance_id))
-
-        subnet_group_name = "bastion-subnet-group"
-        create_db_subnet_group(rds_client, subnet_group_name, vpc_id, private_subnets)
-        resources.append(('rds_subnet_group', subnet_group_name))
-
-        rds_sg = create_rds_security_group(ec2_client, "bastion-rds-sg", vpc_id, ec2_sg)
-        resources.append(('sg', rds_sg))
-
-        create_db_instance(rds_client, rds_sg, subnet_group_name)
-        resources.append(('db_instance', 'bastion-db-instance'))
-
+        _, timings = run_graph(steps, max_workers=args.workers, done=done, on_complete=journal.step)
+        log_timings(timings, steps)
         logging.info("Bastion setup complete")
+        return steps, timings
 
     except Exception as e:
         logging.error(f"Error during setup: {e}")
-        rollback(resources)
+        if args.keep_on_failure:
+            logging.info("Keeping created resources, run --create again to resume or --rollback to clean up")
+        else:
+            rollback(resources, args.region, args.workers, journal)
 
 def main():
     parser = argparse.ArgumentParser(description="AWS Bastion Host CLI Tool")
@@ -118,20 +157,28 @@ def main():
     parser.add_argument('--region', type=str, default='us-east-1')
     parser.add_argument('--key-name', type=str, default='bastion-key')
     parser.add_argument('--instance-name', type=str, default='bastion-ec2')
+    parser.add_argument('--key-dir', type=str, default='.', help='Directory the private key is saved in')
+    parser.add_argument('--workers', type=int, default=8, help='Number of build steps to run at once')
+    parser.add_argument('--journal', type=str, default='bastion_journal.jsonl', help='File that records created resources')
+    parser.add_argument('--keep-on-failure', action='store_true', help='Do not roll back when a step fails')
+    add_profile_arguments(parser)
 
     args = parser.parse_args()
 
+    with profile_calls(args.profile_calls, args.call_trace):
+        run_command(args, parser)
+
+def run_command(args, parser):
     if args.create:
         create_bastion(args)
     elif args.rollback:
         logging.info("Performing manual rollback")
-        rollback([
-            ('db_instance', 'bastion-db-instance'),
-            ('rds_subnet_group', 'bastion-subnet-group'),
-            ('instance', 'i-xxxxxxxxxxxxxxxxx'),
-            ('sg', 'sg-xxxxxxxxxxxxxxxxx'),
-            ('vpc', 'vpc-xxxxxxxxxxxxxxxxx'),
-        ])
+        journal = Journal(args.journal)
+        _, resources = journal.load()
+        if not resources:
+            logging.info(f"No resources recorded in {args.journal}")
+            return
+        rollback(resources, args.region, args.workers, journal)
     else:
         parser.print_help()
 
@@ -0,0 +1,182 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import redirect_stdout, redirect_stderr
+
+import lookup_cache
+from task4_bonus import clients
+from task4_bonus.profiling import CallProfiler
+
+# moto only needs some credentials to sign requests with
+for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SECURITY_TOKEN', 'AWS_SESSION_TOKEN'):
+    os.environ.setdefault(name, 'testing')
+os.environ.setdefault('aws_region_name', 'us-east-1')
+
+
+def add_latency(latency):
+    def sleep(**kwargs):
+        time.sleep(latency)
+
+    def hook(client):
+        client.meta.events.register('before-call', sleep, unique_id='benchmark-latency')
+
+    for client in clients.all_clients():
+        hook(client)
+    clients.client_hooks.append(hook)
+    return lambda: clients.client_hooks.remove(hook)
+
+
+def run_case(name, fn, latency, setup=None):
+    from moto import mock_aws
+
+    clients.clear_clients()
+    with mock_aws():
+        if setup:
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                setup()
+        remove_latency = add_latency(latency)
+        profiler = CallProfiler()
+        profiler.start()
+        started = time.monotonic()
+        try:
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                critical_path = fn()
+        finally:
+            wall = time.monotonic() - started
+            profiler.stop()
+            remove_latency()
+    clients.clear_clients()
+
+    summary = profiler.summary()
+    return {
+        'case': name,
+        'wall_s': round(wall, 3),
+        'calls': sum(row['count'] for row in summary),
+        'by_operation': {row['operation']: row['count'] for row in summary},
+        'critical_path': critical_path or [],
+    }
+
+
+def vpc_build(subnets):
+    import leqcia8_davaleba
+
+    args = argparse.Namespace(
+        vpc_cidr='10.0.0.0/16',
+        num_public_subnets=subnets // 2,
+        num_private_subnets=subnets - subnets // 2,
+        name='benchmark-vpc',
+        plan=False,
+        tag=[],
+    )
+
+    def build():
+        # the plan is applied one step at a time, so every step is on the critical path
+        plan = leqcia8_davaleba.build_network(args) or []
+        counts = Counter(step['action'] for step in plan)
+        return [action if count == 1 else f"{action} x{count}" for action, count in counts.items()]
+
+    return build
+
+
+def bastion_setup():
+    # the SSH rule needs this machine's public IP, which moto does not stand in for
+    lookup_cache.put('public_ip', '203.0.113.10', 3600)
+
+
+def bastion_build(workers):
+    import Lecture11_task1
+    from stack_graph import critical_path
+
+    work_dir = tempfile.mkdtemp()
+    journal_path = os.path.join(work_dir, 'journal.jsonl')
+
+    def build():
+        args = argparse.Namespace(
+            vpc_cidr='10.0.0.0/16', region='us-east-1', key_name='benchmark-key', key_dir=work_dir,
+            instance_name='benchmark-ec2', workers=workers, journal=journal_path, keep_on_failure=True,
+        )
+        result = Lecture11_task1.create_bastion(args)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        if not result:
+            raise RuntimeError("bastion build failed")
+        steps, timings = result
+        return critical_path(steps, timings)
+
+    return build
+
+
+def print_results(results):
+    print(f"{'case':<28}{'wall s':>9}{'calls':>8}  critical path")
+    for result in results:
+        path = ' -> '.join(result['critical_path']) or '-'
+        print(f"{result['case']:<28}{result['wall_s']:>9.2f}{result['calls']:>8}  {path}")
+
+
+def compare(results, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        baseline = {result['case']: result for result in json.load(f)}
+    regressions = []
+    for result in results:
+        before = baseline.get(result['case'])
+        # baselines written before the bastion case could run marked it skipped
+        if not before or 'skipped' in before:
+            continue
+        if result['wall_s'] > before['wall_s'] * (1 + max_regression):
+            regressions.append(f"{result['case']}: wall time {before['wall_s']}s -> {result['wall_s']}s")
+        if result['calls'] > before['calls']:
+            regressions.append(f"{result['case']}: calls {before['calls']} -> {result['calls']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the infrastructure builds against a local moto stand-in.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every API call.')
+    parser.add_argument('--subnets', type=int, default=200, help='Number of subnets in the VPC build.')
+    parser.add_argument('--workers', type=int, default=8, help='Workers for the bastion build.')
+    parser.add_argument('--output', help='Write results as JSON to this file.')
+    parser.add_argument('--baseline', help='Fail if results regress against this earlier --output file.')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed wall time growth over the baseline (0.2 = 20%%).')
+    args = parser.parse_args()
+
+    try:
+        import moto  # noqa: F401
+    except ImportError:
+        print("The benchmark needs moto: pip install 'moto[ec2,rds,ssm]'")
+        sys.exit(2)
+
+    cache_dir = tempfile.mkdtemp()
+    lookup_cache.CACHE_PATH = os.path.join(cache_dir, 'lookups.json')
+
+    build = vpc_build(args.subnets)
+    # (name, builds the function to time, optional untimed setup run in the same mock)
+    cases = [
+        (f'vpc build ({args.subnets} subnets)', lambda: build, None),
+        (f'vpc rebuild ({args.subnets} subnets)', lambda: build, build),
+        ('bastion build', lambda: bastion_build(args.workers), bastion_setup),
+    ]
+
+    results = []
+    for name, make, setup in cases:
+        results.append(run_case(name, make(), args.latency, setup))
+        lookup_cache.invalidate()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
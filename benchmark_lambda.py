@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'task4_bonus', 'file_example_JPG_100kB.jpg')
+
+
+def stub_event(bucket, key):
+    return {'Records': [{'s3': {'bucket': {'name': bucket}, 'object': {'key': key}}}]}
+
+
+class StubBody:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class StubS3:
+    def __init__(self, image_data, latency):
+        self.image_data = image_data
+        self.latency = latency
+        self.puts = []
+
+    def get_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        return {'Body': StubBody(self.image_data)}
+
+    def put_object(self, Bucket, Key, Body):
+        time.sleep(self.latency)
+        self.puts.append(Key)
+
+
+class StubResponse:
+    def json(self):
+        return [{'label': 'tabby, tabby cat', 'score': 0.9}]
+
+
+def child(args):
+    """Import the handler in this fresh interpreter and invoke it with stubbed S3 and HF calls."""
+    started = time.perf_counter()
+    import lecture6_task1
+    import_s = time.perf_counter() - started
+
+    with open(args.image, 'rb') as f:
+        lecture6_task1.s3 = StubS3(f.read(), args.latency)
+
+    def post(url, **kwargs):
+        time.sleep(args.latency)
+        return StubResponse()
+
+    lecture6_task1.http.post = post
+
+    event = stub_event('benchmark-bucket', os.path.basename(args.image))
+    timings = []
+    for _ in range(args.invocations):
+        started = time.perf_counter()
+        lecture6_task1.lambda_handler(event, None)
+        timings.append(time.perf_counter() - started)
+
+    json.dump({
+        'import_s': import_s,
+        'init_s': getattr(lecture6_task1, 'INIT_SECONDS', None),
+        'first_s': timings[0],
+        'warm_s': timings[1:],
+        'puts': len(lecture6_task1.s3.puts),
+        'pil_loaded': 'PIL' in sys.modules,
+    }, sys.stdout)
+
+
+def run_cold_start(args):
+    env = dict(os.environ)
+    # boto3.client('s3') at import needs a region and credentials, never a real call
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--image', args.image,
+               '--invocations', str(args.invocations), '--latency', str(args.latency)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def ms(seconds):
+    return f"{seconds * 1000:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start and warm latency of the image Lambda locally.')
+    parser.add_argument('--cold-starts', type=int, default=5, help='Fresh interpreters to start.')
+    parser.add_argument('--invocations', type=int, default=20, help='Handler calls per interpreter; all but the first are warm.')
+    parser.add_argument('--image', default=DEFAULT_IMAGE, help='Image the stub S3 returns.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every stubbed S3/HF call.')
+    parser.add_argument('--output', help='Write the raw samples as JSON to this file.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    samples = [run_cold_start(args) for _ in range(args.cold_starts)]
+    warm = [t for sample in samples for t in sample['warm_s']]
+
+    print(f"cold starts        {len(samples)}")
+    print(f"module import      median {ms(statistics.median(s['import_s'] for s in samples))}")
+    print(f"first invocation   median {ms(statistics.median(s['first_s'] for s in samples))}")
+    if warm:
+        warm.sort()
+        print(f"warm invocation    p50 {ms(warm[len(warm) // 2])}  p95 {ms(warm[int(len(warm) * 0.95) - 1])}")
+    print(f"PIL imported       {'yes' if any(s['pil_loaded'] for s in samples) else 'no'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(samples, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
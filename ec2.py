@@ -0,0 +1,51 @@
+import logging
+import os
+from leqcia9_davaleba import get_public_ip, get_latest_ami
+from sg_rules import apply_rules
+from task4_bonus.clients import get_client
+from task4_bonus.tagging import tag_specifications
+
+
+def create_key_pair(ec2_client, key_name, directory='.', tags=None):
+    response = ec2_client.create_key_pair(KeyName=key_name, TagSpecifications=tag_specifications('key-pair', tags))
+    path = os.path.join(directory, f'{key_name}.pem')
+    with open(path, 'w') as f:
+        f.write(response['KeyMaterial'])
+    os.chmod(path, 0o400)
+    logging.info(f"Created key pair {key_name}, private key saved to {path}")
+    return key_name
+
+
+def create_security_group(ec2_client, name, description, vpc_id, tags=None):
+    response = ec2_client.create_security_group(GroupName=name, Description=description, VpcId=vpc_id,
+                                                TagSpecifications=tag_specifications('security-group', tags))
+    sg_id = response['GroupId']
+    logging.info(f"Created security group {name}: {sg_id}")
+    return sg_id
+
+
+def add_ssh_access_sg(ec2_client, sg_id):
+    """Allow SSH from this machine's public IP only."""
+    public_ip = get_public_ip()
+    if not public_ip:
+        raise RuntimeError(f"Could not get the public IP, not opening SSH on {sg_id}")
+    apply_rules(ec2_client, sg_id, [('tcp', 22, 22, [f"{public_ip}/32"])])
+    logging.info(f"Allowed SSH to {sg_id} from {public_ip}")
+
+
+def run_ec2(ec2_client, sg_id, subnet_id, instance_name, key_name=None, tags=None):
+    ami_id = get_latest_ami(get_client('ssm', ec2_client.meta.region_name))
+    kwargs = {'KeyName': key_name} if key_name else {}
+    response = ec2_client.run_instances(
+        ImageId=ami_id,
+        InstanceType='t2.micro',
+        MinCount=1,
+        MaxCount=1,
+        SubnetId=subnet_id,
+        SecurityGroupIds=[sg_id],
+        TagSpecifications=tag_specifications('instance', {**(tags or {}), 'Name': instance_name}),
+        **kwargs
+    )
+    instance_id = response['Instances'][0]['InstanceId']
+    logging.info(f"Launched EC2 instance {instance_name}: {instance_id}")
+    return instance_id
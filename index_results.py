@@ -0,0 +1,184 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from task4_bonus.clients import get_client
+from task4_bonus.workers import run_bounded
+
+RESULTS_BUCKET = 'btu-2025-classerni'
+RESULTS_PREFIX = 'json/'
+
+# model folders written by lecture6_task1.py; several contain '_' themselves
+MODELS = ('mobilenet_v1_0.75_192', 'resnet-50', 'mit-b0', 'yolos-tiny')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY,
+    etag TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    key TEXT NOT NULL,
+    image TEXT NOT NULL,
+    model TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    label TEXT,
+    score REAL,
+    xmin REAL, ymin REAL, xmax REAL, ymax REAL
+);
+CREATE INDEX IF NOT EXISTS predictions_model_rank_score ON predictions (model, rank, score);
+CREATE INDEX IF NOT EXISTS predictions_image ON predictions (image);
+CREATE INDEX IF NOT EXISTS predictions_key ON predictions (key);
+'''
+
+
+def open_index(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.executescript(SCHEMA)
+    return db
+
+
+def parse_key(key, prefix=RESULTS_PREFIX):
+    name = key[len(prefix):].rsplit('.json', 1)[0]
+    for model in MODELS:
+        if name.startswith(model + '_'):
+            return model, name[len(model) + 1:]
+    model, _, image = name.partition('_')
+    return model, image
+
+
+def prediction_rows(key, image, model, result):
+    if isinstance(result, dict):
+        # the Inference API answers {"error": ...} when a model is loading
+        raise ValueError(result.get('error', 'unexpected result'))
+    if not isinstance(result, list):
+        raise ValueError(f'unexpected result: {result!r}')
+    items = []
+    for item in result:
+        if isinstance(item, dict):
+            items.append(item)
+        else:
+            print(f"Warning: skipping unexpected item in {key}: {item!r}")
+    ranked = sorted(items, key=lambda item: item.get('score') or 0, reverse=True)
+    for rank, item in enumerate(ranked, start=1):
+        box = item.get('box') or {}
+        yield (key, image, model, rank, item.get('label'), item.get('score'),
+               box.get('xmin'), box.get('ymin'), box.get('xmax'), box.get('ymax'))
+
+
+def changed_objects(s3, bucket, prefix, known, counts=None):
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if not obj['Key'].endswith('.json'):
+                continue
+            if known.get(obj['Key']) != obj['ETag']:
+                yield obj['Key'], obj['ETag']
+            elif counts is not None:
+                counts['unchanged'] += 1
+
+
+def sync(args):
+    s3 = get_client('s3', max_workers=args.workers)
+    db = open_index(args.db)
+    known = dict(db.execute('SELECT key, etag FROM objects'))
+    lock = threading.Lock()
+    counts = {'indexed': 0, 'failed': 0, 'unchanged': 0}
+    started = time.monotonic()
+
+    def index_one(item):
+        key, etag = item
+        model, image = parse_key(key, args.prefix)
+        error = None
+        rows = []
+        try:
+            body = s3.get_object(Bucket=args.bucket, Key=key, IfMatch=etag)['Body'].read()
+        except ClientError as e:
+            # not recorded, so the next sync tries this key again
+            print(f"Error fetching {key}: {e}")
+            with lock:
+                counts['failed'] += 1
+            return
+        try:
+            rows = list(prediction_rows(key, image, model, json.loads(body)))
+        except ValueError as e:
+            error = str(e)
+
+        with lock:
+            db.execute('DELETE FROM predictions WHERE key = ?', (key,))
+            db.executemany('INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?)', (key, etag, error))
+            counts['failed' if error else 'indexed'] += 1
+            done = counts['indexed'] + counts['failed']
+            # checkpoint regularly so an interrupted sync resumes where it stopped
+            if done % args.checkpoint_every == 0:
+                db.commit()
+                print(f"{done} objects indexed ({done / (time.monotonic() - started):.0f}/s)")
+
+    try:
+        run_bounded(index_one, changed_objects(s3, args.bucket, args.prefix, known, counts), args.workers)
+    finally:
+        with lock:
+            db.commit()
+        db.close()
+    print(f"Indexed {counts['indexed']} object(s), {counts['failed']} failed, "
+          f"{counts['unchanged']} already up to date, in {time.monotonic() - started:.1f}s")
+
+
+def query(args):
+    db = open_index(args.db)
+    if args.sql:
+        sql, params = args.sql, []
+    else:
+        conditions, params = [], []
+        for column, op, value in (('model', '=', args.model), ('label', '=', args.label), ('rank', '<=', args.top),
+                                  ('score', '<', args.below), ('score', '>=', args.above)):
+            if value is not None:
+                conditions.append(f'{column} {op} ?')
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f'SELECT image, model, rank, label, score, xmin, ymin, xmax, ymax FROM predictions {where} ORDER BY image, model, rank'
+
+    started = time.perf_counter()
+    cursor = db.execute(sql, params)
+    print('\t'.join(column[0] for column in cursor.description))
+    count = 0
+    for row in cursor:
+        print('\t'.join('' if value is None else str(value) for value in row))
+        count += 1
+    print(f"{count} row(s) in {(time.perf_counter() - started) * 1000:.1f} ms")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the image Lambda's JSON results in a local SQLite database.")
+    parser.add_argument('--db', default='results.db', help='SQLite index file.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sync_parser = subparsers.add_parser('sync', help='Fetch new or changed result files into the index.')
+    sync_parser.add_argument('--bucket', default=RESULTS_BUCKET)
+    sync_parser.add_argument('--prefix', default=RESULTS_PREFIX)
+    sync_parser.add_argument('--workers', type=int, default=32, help='Concurrent GET requests.')
+    sync_parser.add_argument('--checkpoint-every', type=int, default=500, help='Commit the index after this many objects.')
+
+    query_parser = subparsers.add_parser('query', help='Query the local index, e.g. --model resnet-50 --top 1 --below 0.5')
+    query_parser.add_argument('--model')
+    query_parser.add_argument('--label')
+    query_parser.add_argument('--top', type=int, help='Only the N highest-scoring predictions per image.')
+    query_parser.add_argument('--below', type=float, help='Score lower than this.')
+    query_parser.add_argument('--above', type=float, help='Score at least this.')
+    query_parser.add_argument('--sql', help='Run this SQL against the predictions/objects tables instead.')
+
+    args = parser.parse_args()
+    if args.command == 'sync':
+        sync(args)
+    else:
+        query(args)
+
+
+if __name__ == '__main__':
+    main()
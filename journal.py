@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+    """Append-only JSON-lines record of created resources and finished steps."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.exists(path) and os.path.getsize(path):
+            # start new entries on a fresh line after a torn write
+            with open(path, 'rb+') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+
+    def _append(self, entry):
+        entry['time'] = time.time()
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def resource(self, r_type, r_id, step=None):
+        entry = {'event': 'resource', 'type': r_type, 'id': r_id}
+        if step:
+            entry['step'] = step
+        self._append(entry)
+
+    def step(self, name, result):
+        self._append({'event': 'step', 'step': name, 'result': result})
+
+    def rollback(self, deleted):
+        self._append({'event': 'rollback', 'deleted': [[r_type, r_id] for r_type, r_id in deleted]})
+
+    def load(self):
+        """Return (finished steps, live resources) by replaying the journal.
+
+        Step names may have sub-steps named ``step:part``. A rollback forgets the
+        steps that created a deleted resource, their parent step and the parent's
+        sub-steps that created nothing; everything else stays finished.
+        """
+        done = {}
+        resources = []
+        owners = {}
+        if not os.path.exists(self.path):
+            return done, resources
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a crash can leave a torn last line
+                    continue
+                if entry['event'] == 'resource':
+                    resource = _resource(entry['type'], entry['id'])
+                    resources.append(resource)
+                    if entry.get('step'):
+                        owners[resource] = entry['step']
+                elif entry['event'] == 'step':
+                    done[entry['step']] = entry['result']
+                elif entry['event'] == 'rollback':
+                    deleted = {_resource(r_type, r_id) for r_type, r_id in entry['deleted']}
+                    resources = [resource for resource in resources if resource not in deleted]
+                    if any(resource not in owners for resource in deleted):
+                        # written before resources named their step
+                        done = {}
+                        continue
+                    undone = {owners[resource] for resource in deleted}
+                    parents = {name.split(':', 1)[0] for name in undone}
+                    creators = set(owners.values())
+                    done = {name: result for name, result in done.items()
+                            if name not in undone and name not in parents
+                            and not (name.split(':', 1)[0] in parents and name not in creators)}
+        return done, list(dict.fromkeys(resources))
+
+
+def _resource(r_type, r_id):
+    return (r_type, tuple(r_id) if isinstance(r_id, list) else r_id)
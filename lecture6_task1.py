@@ -1,54 +1,84 @@
+import time
+
+_init_started = time.perf_counter()
+
 import json
 import boto3
 import requests
 from io import BytesIO
-from PIL import Image
 import os
 
 
 # HF_API_TOKEN = "chemi tokeni"
+HF_API_TOKEN = os.environ.get("HF_API_TOKEN")
+
+MODELS = [
+    "google/mobilenet_v1_0.75_192",
+    "microsoft/resnet-50",
+    "nvidia/mit-b0",
+    "hustvl/yolos-tiny",
+]
 
+LOG_TIMINGS = os.environ.get("LOG_TIMINGS") == "1"
 
+# created once per container and reused by every warm invocation
 s3 = boto3.client('s3')
+http = requests.Session()
+http.headers["Authorization"] = f"Bearer {HF_API_TOKEN}"
+
+INIT_SECONDS = time.perf_counter() - _init_started
+_cold = True
+
+
+def as_jpeg(image_data):
+    if image_data[:3] == b"\xff\xd8\xff":
+        return image_data
+    # PIL is only needed to convert other formats, so it is imported on demand
+    from PIL import Image
+
+    buffered = BytesIO()
+    Image.open(BytesIO(image_data)).convert("RGB").save(buffered, format="JPEG")
+    return buffered.getvalue()
+
 
 def lambda_handler(event, context):
-    
+    global _cold
+    started = time.perf_counter()
+
     bucket = event['Records'][0]['s3']['bucket']['name']
     key = event['Records'][0]['s3']['object']['key']
     
     
     response = s3.get_object(Bucket=bucket, Key=key)
     image_data = response['Body'].read()
-    image = Image.open(BytesIO(image_data))
+    # encode once and share it between the models
+    img_bytes = as_jpeg(image_data)
     
    
-    process_with_model(image, key, "google/mobilenet_v1_0.75_192")
-    process_with_model(image, key, "microsoft/resnet-50")
-    process_with_model(image, key, "nvidia/mit-b0")
-    process_with_model(image, key, "hustvl/yolos-tiny")
-    
+    for model_name in MODELS:
+        process_with_model(img_bytes, key, model_name)
+
+    if LOG_TIMINGS:
+        phase = f"cold (init {INIT_SECONDS * 1000:.0f} ms)" if _cold else "warm"
+        print(f"{phase} invocation took {(time.perf_counter() - started) * 1000:.0f} ms")
+    _cold = False
+
     return {
         'statusCode': 200,
         'body': json.dumps('Image processing completed!')
     }
 
-def process_with_model(image, image_key, model_name):
+def process_with_model(img_bytes, image_key, model_name):
     try:
         
-        buffered = BytesIO()
-        image.save(buffered, format="JPEG")
-        img_bytes = buffered.getvalue()
-        
-        
         api_url = f"https://api-inference.huggingface.co/models/{model_name}"
-        headers = {"Authorization": f"Bearer {HF_API_TOKEN}"}
         
         if "yolos" in model_name:
             
-            response = requests.post(api_url, headers=headers, data=img_bytes)
+            response = http.post(api_url, data=img_bytes)
         else:
            
-            response = requests.post(api_url, headers=headers, json={"inputs": img_bytes})
+            response = http.post(api_url, json={"inputs": img_bytes})
         
         result = response.json()
         
@@ -56,12 +86,12 @@ def process_with_model(image, image_key, model_name):
         
         model_folder = model_name.split('/')[-1]
         output_key = f"json/{model_folder}_{image_name}.json"
-        
+
         s3.put_object(
             Bucket='btu-2025-classerni',
             Key=output_key,
             Body=json.dumps(result)
         )
-        
+
     except Exception as e:
         print(f"Error processing with {model_name}: {str(e)}")
\ No newline at end of file
@@ -1,60 +1,189 @@
-import boto3
+import json
+import sys
 from os import getenv
 import argparse
+from vpc_plan import paginate, find_vpc
+import lookup_cache
+from task4_bonus.clients import get_client
+from task4_bonus.profiling import add_profile_arguments, profile_calls
+from task4_bonus.regions import enabled_regions, fan_out, print_region_report
+from task4_bonus.tagging import parse_tags, tag_specifications, bulk_tag
 
-ec2_client = boto3.client(
-  "ec2",
-  aws_access_key_id=getenv("aws_access_key_id"),
-  aws_secret_access_key=getenv("aws_secret_access_key"),
-  aws_session_token=getenv("aws_session_token"),
-  region_name=getenv("aws_region_name")
-)
-
-def list_vpcs():
-  result = ec2_client.describe_vpcs()
-  vpcs = result.get("Vpcs")
-  print(vpcs)
-
-def create_vpc():
-  result = ec2_client.create_vpc(CidrBlock="10.0.0.0/16")
+ec2_client = get_client("ec2", getenv("aws_region_name"))
+
+VPC_COLUMNS = [("VpcId", 22), ("CidrBlock", 18), ("State", 10), ("Name", 24)]
+COUNT_COLUMNS = [("Subnets", 8), ("IGWs", 5), ("RouteTables", 12)]
+
+def vpc_filters(tags=(), cidr=None, state=None):
+  filters = []
+  for tag in tags:
+    key, _, value = tag.partition("=")
+    filters.append({"Name": f"tag:{key}", "Values": [value]} if value else {"Name": "tag-key", "Values": [key]})
+  if cidr:
+    filters.append({"Name": "cidr", "Values": [cidr]})
+  if state:
+    filters.append({"Name": "state", "Values": [state]})
+  return filters
+
+def count_per_vpc(operation, result_key, vpc_filter_name, vpc_ids, client=ec2_client):
+  counts = dict.fromkeys(vpc_ids, 0)
+  for i in range(0, len(vpc_ids), 200):
+    filters = [{"Name": vpc_filter_name, "Values": vpc_ids[i:i + 200]}]
+    for item in paginate(client, operation, result_key, Filters=filters):
+      if item.get("VpcId") in counts:
+        counts[item["VpcId"]] += 1
+      for attachment in item.get("Attachments", []):
+        if attachment.get("VpcId") in counts:
+          counts[attachment["VpcId"]] += 1
+  return counts
+
+def add_counts(vpcs, client=ec2_client):
+  vpc_ids = [vpc["VpcId"] for vpc in vpcs]
+  subnets = count_per_vpc("describe_subnets", "Subnets", "vpc-id", vpc_ids, client)
+  igws = count_per_vpc("describe_internet_gateways", "InternetGateways", "attachment.vpc-id", vpc_ids, client)
+  route_tables = count_per_vpc("describe_route_tables", "RouteTables", "vpc-id", vpc_ids, client)
+  for vpc in vpcs:
+    vpc["Subnets"] = subnets[vpc["VpcId"]]
+    vpc["IGWs"] = igws[vpc["VpcId"]]
+    vpc["RouteTables"] = route_tables[vpc["VpcId"]]
+
+def iter_vpc_pages(filters, with_counts=False, page_size=100, client=ec2_client):
+  paginator = client.get_paginator("describe_vpcs")
+  for page in paginator.paginate(Filters=filters, PaginationConfig={"PageSize": page_size}):
+    vpcs = page.get("Vpcs", [])
+    if with_counts and vpcs:
+      add_counts(vpcs, client)
+    yield vpcs
+
+def vpc_name(vpc):
+  for tag in vpc.get("Tags", []):
+    if tag["Key"] == "Name":
+      return tag["Value"]
+  return ""
+
+def print_vpc(vpc, output, columns):
+  if output == "json":
+    print(json.dumps(vpc), flush=True)
+  else:
+    row = dict(vpc, Name=vpc_name(vpc))
+    print("".join(f"{str(row.get(name, '')):<{width}}" for name, width in columns), flush=True)
+
+def list_vpcs_all_regions(filters, output, with_counts):
+  columns = [("Region", 16)] + VPC_COLUMNS + (COUNT_COLUMNS if with_counts else [])
+  if output == "table":
+    print("".join(f"{name:<{width}}" for name, width in columns))
+
+  def region_vpcs(region):
+    client = get_client("ec2", region)
+    return [vpc for page in iter_vpc_pages(filters, with_counts, client=client) for vpc in page]
+
+  report = []
+  for region, vpcs, seconds, error in fan_out(region_vpcs, enabled_regions()):
+    for vpc in vpcs or []:
+      print_vpc(dict(vpc, Region=region), output, columns)
+    report.append((region, len(vpcs or []), seconds, error))
+  print_region_report(report, sys.stderr if output == "json" else None)
+
+def list_vpcs(tags=(), cidr=None, state=None, output="table", with_counts=False, all_regions=False, cached=False):
+  filters = vpc_filters(tags, cidr, state)
+  if all_regions:
+    list_vpcs_all_regions(filters, output, with_counts)
+    return
+  columns = VPC_COLUMNS + (COUNT_COLUMNS if with_counts else [])
+  cache_key = f"vpcs:{ec2_client.meta.region_name}:{json.dumps(filters, sort_keys=True)}:{with_counts}"
+
+  if output == "table":
+    print("".join(f"{name:<{width}}" for name, width in columns))
+
+  # a listing is live unless a cached one was asked for or there is no network to use
+  if cached or lookup_cache.offline:
+    try:
+      vpcs = lookup_cache.get(cache_key)
+    except LookupError as e:
+      print(e)
+      return
+    if vpcs is not None:
+      for vpc in vpcs:
+        print_vpc(vpc, output, columns)
+      return
+
+  vpcs = []
+  for page in iter_vpc_pages(filters, with_counts):
+    for vpc in page:
+      print_vpc(vpc, output, columns)
+    vpcs.extend(page)
+  lookup_cache.put(cache_key, vpcs, 300)
+
+def create_vpc(tags=None):
+  result = ec2_client.create_vpc(CidrBlock="10.0.0.0/16", TagSpecifications=tag_specifications("vpc", tags))
+  lookup_cache.invalidate(f"vpcs:{ec2_client.meta.region_name}")
   vpc = result.get("Vpc")
   print(vpc)
   return result
 
-def add_name_tag(vpc_id, name="Ernesto"):
-  ec2_client.create_tags(Resources=[vpc_id],
-                       Tags=[{
-                         "Key": "Name",
-                         "Value": name
-                       }])
-
-def create_igw():
-  result = ec2_client.create_internet_gateway()
+def create_igw(tags=None):
+  result = ec2_client.create_internet_gateway(TagSpecifications=tag_specifications("internet-gateway", tags))
   return result.get("InternetGateway").get("InternetGatewayId")
 
-def create_public_subnet(vpc_id, cidr="10.0.1.0/24"):
-  result = ec2_client.create_subnet(CidrBlock=cidr, VpcId=vpc_id)
+def create_public_subnet(vpc_id, cidr="10.0.1.0/24", tags=None):
+  result = ec2_client.create_subnet(CidrBlock=cidr, VpcId=vpc_id, TagSpecifications=tag_specifications("subnet", tags))
+  lookup_cache.invalidate(f"vpcs:{ec2_client.meta.region_name}")
   return result.get("Subnet").get("SubnetId")
 
-def create_private_subnet(vpc_id="vpc-0bde832998b4d4910", cidr="10.0.2.0/24", az='us-east-1a'):
-    subnet_id = ec2_client.create_subnet(VpcId=vpc_id, CidrBlock=cidr, AvailabilityZone=az)["Subnet"]["SubnetId"]
+def create_private_subnet(vpc_id="vpc-0bde832998b4d4910", cidr="10.0.2.0/24", az='us-east-1a', tags=None):
+    subnet_id = ec2_client.create_subnet(VpcId=vpc_id, CidrBlock=cidr, AvailabilityZone=az,
+                                         TagSpecifications=tag_specifications("subnet", tags))["Subnet"]["SubnetId"]
+    lookup_cache.invalidate(f"vpcs:{ec2_client.meta.region_name}")
     ec2_client.modify_subnet_attribute(SubnetId=subnet_id, MapPublicIpOnLaunch={'Value': False})
     ec2_client.associate_route_table(
-        RouteTableId=ec2_client.create_route_table(VpcId=vpc_id)["RouteTable"]["RouteTableId"],
+        RouteTableId=ec2_client.create_route_table(VpcId=vpc_id, TagSpecifications=tag_specifications("route-table", tags))["RouteTable"]["RouteTableId"],
         SubnetId=subnet_id
     )
     return subnet_id
 
 def attach_igw_to_vpc(vpc_id, igw_id):
   ec2_client.attach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
+  lookup_cache.invalidate(f"vpcs:{ec2_client.meta.region_name}")
+
+def find_subnet(vpc_id, cidr):
+  filters = [{"Name": "vpc-id", "Values": [vpc_id]}, {"Name": "cidr-block", "Values": [cidr]}]
+  for subnet in paginate(ec2_client, "describe_subnets", "Subnets", Filters=filters):
+    return subnet["SubnetId"]
+  return None
+
+def find_attached_igw(vpc_id):
+  filters = [{"Name": "attachment.vpc-id", "Values": [vpc_id]}]
+  for igw in paginate(ec2_client, "describe_internet_gateways", "InternetGateways", Filters=filters):
+    return igw["InternetGatewayId"]
+  return None
+
+def read_tag_file(path, common_tags):
+  tags_by_resource = {}
+  with open(path) as f:
+    for line in f:
+      parts = line.split()
+      if parts:
+        tags_by_resource[parts[0]] = {**common_tags, **parse_tags(parts[1:])}
+  return tags_by_resource
 
 def main():
 
     parser = argparse.ArgumentParser(description="AWS VPC Management Tool")
+    parser.add_argument('--plan', action='store_true', help='Only print the changes that would be made')
+    lookup_cache.add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    parser.add_argument('--set-tag', action='append', default=[], help='Tag created resources with KEY=VALUE (repeatable)')
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
     
     list_parser = subparsers.add_parser('list-vpcs', help='List all VPCs')
+    list_parser.add_argument('--tag', action='append', default=[], help='Only VPCs with this tag, as KEY=VALUE or KEY (repeatable)')
+    list_parser.add_argument('--cidr', type=str, help='Only VPCs with this primary CIDR block')
+    list_parser.add_argument('--state', choices=['pending', 'available'], help='Only VPCs in this state')
+    list_parser.add_argument('--output', choices=['table', 'json'], default='table', help='Table rows or JSON lines')
+    list_parser.add_argument('--counts', action='store_true', help='Include subnet, IGW and route table counts')
+    list_parser.add_argument('--all-regions', action='store_true', help='Query every enabled region at once')
+    list_parser.add_argument('--cached', action='store_true', help='Reuse a listing up to 5 minutes old instead of querying')
     
     
     create_vpc_parser = subparsers.add_parser('create-vpc', help='Create a new VPC')
@@ -79,26 +208,68 @@ def main():
     priv_sub_parser.add_argument('--cidr', type=str, default="10.0.2.0/24", help='CIDR block for the subnet')
     priv_sub_parser.add_argument('--az', type=str, default='us-east-1a', help='Availability Zone for the subnet')
     
+    bulk_tag_parser = subparsers.add_parser('bulk-tag', help='Tag many existing resources with batched create_tags calls')
+    bulk_tag_parser.add_argument('--ids-file', type=str, required=True,
+                                 help='File with one resource ID per line, optionally followed by KEY=VALUE tags')
+    bulk_tag_parser.add_argument('--batch-size', type=int, default=1000, help='Resource IDs per create_tags call')
+    
     args = parser.parse_args()
+    lookup_cache.configure(args)
     
+    with profile_calls(args.profile_calls, args.call_trace):
+        run_command(args)
+
+def run_command(args):
+    tags = parse_tags(args.set_tag)
     if args.command == 'list-vpcs':
-        list_vpcs()
+        list_vpcs(args.tag, args.cidr, args.state, args.output, args.counts, args.all_regions, args.cached)
     elif args.command == 'create-vpc':
-        vpc_response = create_vpc()
-        vpc_id = vpc_response.get("Vpc").get("VpcId")
-        add_name_tag(vpc_id, args.name)
+        vpc_id = find_vpc(ec2_client, "10.0.0.0/16", args.name)
+        if vpc_id:
+            print(f"VPC already exists: {vpc_id}")
+        elif args.plan:
+            print(f"Plan: + create_vpc (cidr=10.0.0.0/16, name={args.name})")
+        else:
+            create_vpc({**tags, "Name": args.name})
     elif args.command == 'create-igw':
-        igw_id = create_igw()
+        igw_id = create_igw(tags)
         print(f"Created Internet Gateway: {igw_id}")
     elif args.command == 'attach-igw':
-        attach_igw_to_vpc(args.vpc_id, args.igw_id)
-        print(f"Attached IGW {args.igw_id} to VPC {args.vpc_id}")
+        attached_igw = find_attached_igw(args.vpc_id)
+        if attached_igw:
+            print(f"VPC {args.vpc_id} already has IGW {attached_igw} attached")
+        elif args.plan:
+            print(f"Plan: + attach_igw (igw={args.igw_id}, vpc={args.vpc_id})")
+        else:
+            attach_igw_to_vpc(args.vpc_id, args.igw_id)
+            print(f"Attached IGW {args.igw_id} to VPC {args.vpc_id}")
     elif args.command == 'create-public-subnet':
-        subnet_id = create_public_subnet(args.vpc_id, args.cidr)
-        print(f"Created Public Subnet: {subnet_id}")
+        subnet_id = find_subnet(args.vpc_id, args.cidr)
+        if subnet_id:
+            print(f"Subnet {args.cidr} already exists: {subnet_id}")
+        elif args.plan:
+            print(f"Plan: + create_public_subnet (cidr={args.cidr}, vpc={args.vpc_id})")
+        else:
+            subnet_id = create_public_subnet(args.vpc_id, args.cidr, tags)
+            print(f"Created Public Subnet: {subnet_id}")
     elif args.command == 'create-private-subnet':
-        subnet_id = create_private_subnet(args.vpc_id, args.cidr, args.az)
-        print(f"Created Private Subnet: {subnet_id}")
+        subnet_id = find_subnet(args.vpc_id, args.cidr)
+        if subnet_id:
+            print(f"Subnet {args.cidr} already exists: {subnet_id}")
+        elif args.plan:
+            print(f"Plan: + create_private_subnet (cidr={args.cidr}, vpc={args.vpc_id}, az={args.az})")
+        else:
+            subnet_id = create_private_subnet(args.vpc_id, args.cidr, args.az, tags)
+            print(f"Created Private Subnet: {subnet_id}")
+    elif args.command == 'bulk-tag':
+        tags_by_resource = read_tag_file(args.ids_file, tags)
+        # IDs listed without tags, when no --set-tag applies, have nothing to tag
+        untagged = sum(1 for resource_tags in tags_by_resource.values() if not resource_tags)
+        tagged, errors = bulk_tag(ec2_client, tags_by_resource, args.batch_size)
+        for error in errors:
+            print(f"Error tagging {error}")
+        print(f"Tagged {tagged} of {len(tags_by_resource) - untagged} resources"
+              + (f", skipped {untagged} without tags" if untagged else ""))
     else:
         "Error"
 
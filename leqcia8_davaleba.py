@@ -1,11 +1,15 @@
 import argparse
-import boto3
-from botocore.exceptions import ClientError
-
-def create_vpc(ec2_client, cidr_block):
+from botocore.exceptions import BotoCoreError, ClientError
+from vpc_plan import snapshot_network, public_route_table, plan_network, print_plan, find_attached_igw
+import lookup_cache
+from task4_bonus.clients import get_client
+from task4_bonus.profiling import add_profile_arguments, profile_calls
+from task4_bonus.tagging import parse_tags, tag_specifications
+
+def create_vpc(ec2_client, cidr_block, tags=None):
     
     try:
-        response = ec2_client.create_vpc(CidrBlock=cidr_block)
+        response = ec2_client.create_vpc(CidrBlock=cidr_block, TagSpecifications=tag_specifications('vpc', tags))
         vpc_id = response['Vpc']['VpcId']
         print(f"VPC Created: {vpc_id}")
         return vpc_id
@@ -13,13 +17,14 @@ def create_vpc(ec2_client, cidr_block):
         print(f"Error creating VPC: {e}")
         return None
 
-def create_subnet(ec2_client, vpc_id, cidr_block, availability_zone, is_public=False):
+def create_subnet(ec2_client, vpc_id, cidr_block, availability_zone, is_public=False, tags=None):
     
     try:
         response = ec2_client.create_subnet(
             VpcId=vpc_id,
             CidrBlock=cidr_block,
-            AvailabilityZone=availability_zone
+            AvailabilityZone=availability_zone,
+            TagSpecifications=tag_specifications('subnet', tags)
         )
         subnet_id = response['Subnet']['SubnetId']
         print(f"Subnet Created: {subnet_id}")
@@ -34,10 +39,10 @@ def create_subnet(ec2_client, vpc_id, cidr_block, availability_zone, is_public=F
         print(f"Error creating subnet: {e}")
         return None
 
-def create_internet_gateway(ec2_client, vpc_id):
+def create_internet_gateway(ec2_client, vpc_id, tags=None):
     
     try:
-        response = ec2_client.create_internet_gateway()
+        response = ec2_client.create_internet_gateway(TagSpecifications=tag_specifications('internet-gateway', tags))
         igw_id = response['InternetGateway']['InternetGatewayId']
         print(f"Internet Gateway Created: {igw_id}")
         ec2_client.attach_internet_gateway(
@@ -50,10 +55,10 @@ def create_internet_gateway(ec2_client, vpc_id):
         print(f"Error creating or attaching Internet Gateway: {e}")
         return None
 
-def create_public_route_table(ec2_client, vpc_id, igw_id):
+def create_public_route_table(ec2_client, vpc_id, igw_id, tags=None):
     
     try:
-        response = ec2_client.create_route_table(VpcId=vpc_id)
+        response = ec2_client.create_route_table(VpcId=vpc_id, TagSpecifications=tag_specifications('route-table', tags))
         route_table_id = response['RouteTable']['RouteTableId']
         print(f"Public Route Table Created: {route_table_id}")
         ec2_client.create_route(
@@ -67,98 +72,159 @@ def create_public_route_table(ec2_client, vpc_id, igw_id):
         print(f"Error creating public route table or route: {e}")
         return None
 
-def associate_route_table_with_subnet(ec2_client, route_table_id, subnet_id):
+def associate_route_table_with_subnet(ec2_client, route_table_id, subnet_id, association_id=None):
     
     try:
-        ec2_client.associate_route_table(
-            RouteTableId=route_table_id,
-            SubnetId=subnet_id
-        )
+        if association_id:
+            ec2_client.replace_route_table_association(
+                AssociationId=association_id,
+                RouteTableId=route_table_id
+            )
+        else:
+            ec2_client.associate_route_table(
+                RouteTableId=route_table_id,
+                SubnetId=subnet_id
+            )
         print(f"Route table {route_table_id} associated with subnet {subnet_id}.")
     except ClientError as e:
         print(f"Error associating route table with subnet: {e}")
 
+def desired_subnets(vpc_cidr, num_public_subnets, num_private_subnets, availability_zones):
+    vpc_cidr_parts = vpc_cidr.split('/')
+    base_ip_parts = list(map(int, vpc_cidr_parts[0].split('.')))
+    subnet_cidr_prefix = 24
+
+    # subnets are spread round-robin over the zones, public ones first
+    subnets = []
+    for i in range(num_public_subnets + num_private_subnets):
+        third_octet = base_ip_parts[2] + i
+        if third_octet > 255:
+            print(f"Warning: VPC CIDR {vpc_cidr} only has room for {i} /24 subnets.")
+            break
+        subnet_cidr = f"{base_ip_parts[0]}.{base_ip_parts[1]}.{third_octet}.0/{subnet_cidr_prefix}"
+        subnets.append({'cidr': subnet_cidr, 'az': availability_zones[i % len(availability_zones)], 'public': i < num_public_subnets})
+    return subnets
+
+def apply_plan(ec2_client, plan, snapshot, vpc_cidr, name, tags=None):
+    tags = tags or {}
+    public_rtb = public_route_table(snapshot)
+    state = {
+        'vpc_id': snapshot['vpc_id'],
+        'igw_id': snapshot['igw_id'],
+        'route_table_id': public_rtb['RouteTableId'] if public_rtb else None,
+        'subnets': {cidr: subnet['SubnetId'] for cidr, subnet in snapshot['subnets'].items()},
+    }
+
+    for step in plan:
+        action = step['action']
+        if action == 'create_vpc':
+            state['vpc_id'] = create_vpc(ec2_client, vpc_cidr, {**tags, 'Name': name})
+            if not state['vpc_id']:
+                return None
+        elif action == 'create_igw':
+            # another run may have attached one since the snapshot was taken
+            try:
+                state['igw_id'] = find_attached_igw(ec2_client, state['vpc_id'])
+            except ClientError as e:
+                print(f"Error describing Internet Gateways: {e}")
+                return None
+            if state['igw_id']:
+                print(f"Using Internet Gateway {state['igw_id']} already attached to {state['vpc_id']}.")
+            else:
+                state['igw_id'] = create_internet_gateway(ec2_client, state['vpc_id'], {**tags, 'Name': f"{name}-igw"})
+            if not state['igw_id']:
+                return None
+        elif action == 'create_public_route_table':
+            state['route_table_id'] = create_public_route_table(ec2_client, state['vpc_id'], state['igw_id'], {**tags, 'Name': f"{name}-public"})
+            if not state['route_table_id']:
+                return None
+        elif action == 'create_subnet':
+            kind = 'public' if step['public'] else 'private'
+            subnet_id = create_subnet(ec2_client, state['vpc_id'], step['cidr'], step['az'], is_public=step['public'],
+                                      tags={**tags, 'Name': f"{name}-{kind}-{step['cidr']}"})
+            if subnet_id:
+                state['subnets'][step['cidr']] = subnet_id
+        elif action == 'enable_public_ips':
+            try:
+                ec2_client.modify_subnet_attribute(SubnetId=step['subnet_id'], MapPublicIpOnLaunch={'Value': True})
+                print(f"Subnet {step['subnet_id']} set to auto-assign public IPs.")
+            except ClientError as e:
+                print(f"Error enabling public IPs on subnet: {e}")
+        elif action == 'associate_route_table':
+            subnet_id = step.get('subnet_id') or state['subnets'].get(step['cidr'])
+            if subnet_id:
+                associate_route_table_with_subnet(ec2_client, state['route_table_id'], subnet_id, step.get('association_id'))
+    return state
+
 def main():
     parser = argparse.ArgumentParser(description='Create an AWS VPC with specified public and private subnets.')
     parser.add_argument('--vpc-cidr', required=True, help='CIDR block for the VPC (e.g., 10.0.0.0/16).')
     parser.add_argument('--num-public-subnets', type=int, default=1, help='Number of public subnets to create (max 200 total).')
     parser.add_argument('--num-private-subnets', type=int, default=1, help='Number of private subnets to create (max 200 total).')
+    parser.add_argument('--name', default='leqcia8-vpc', help='Name tag used to find the VPC on repeat runs.')
+    parser.add_argument('--plan', action='store_true', help='Only print the changes that would be made.')
+    parser.add_argument('--tag', action='append', default=[], help='Tag every created resource with KEY=VALUE (repeatable).')
+    lookup_cache.add_cache_arguments(parser)
+    add_profile_arguments(parser)
 
     args = parser.parse_args()
+    lookup_cache.configure(args)
+
+    with profile_calls(args.profile_calls, args.call_trace):
+        build_network(args)
 
+def build_network(args):
     total_subnets = args.num_public_subnets + args.num_private_subnets
     if total_subnets > 200:
         print("Error: Total number of subnets cannot exceed 200.")
         return
 
-    ec2_client = boto3.client('ec2')
+    if int(args.vpc_cidr.split('/')[1]) > 23:
+         print("Error: VPC CIDR block must be at least /23 to accommodate /24 subnets.")
+         return
+
+    ec2_client = get_client('ec2')
 
     
     try:
-        response = ec2_client.describe_availability_zones(State='available')
-        availability_zones = [az['ZoneName'] for az in response['AvailabilityZones']]
+        availability_zones = lookup_cache.cached(
+            f"availability_zones:{ec2_client.meta.region_name}",
+            24 * 3600,
+            lambda: [az['ZoneName'] for az in ec2_client.describe_availability_zones(
+                Filters=[{'Name': 'state', 'Values': ['available']}])['AvailabilityZones']]
+        )
         if not availability_zones:
             print("Error: No available Availability Zones found.")
             return
-    except ClientError as e:
+    except (ClientError, BotoCoreError, LookupError) as e:
         print(f"Error describing Availability Zones: {e}")
         return
 
-    
-    vpc_id = create_vpc(ec2_client, args.vpc_cidr)
-    if not vpc_id:
-        return
-
-    
-    igw_id = create_internet_gateway(ec2_client, vpc_id)
-    if not igw_id:
-        
-        return
+    subnets = desired_subnets(args.vpc_cidr, args.num_public_subnets, args.num_private_subnets, availability_zones)
 
-    
-    public_route_table_id = create_public_route_table(ec2_client, vpc_id, igw_id)
-    if not public_route_table_id:
-        
+    try:
+        snapshot = snapshot_network(ec2_client, args.vpc_cidr, args.name)
+    except ClientError as e:
+        print(f"Error describing existing network: {e}")
         return
 
-    vpc_cidr_parts = args.vpc_cidr.split('/')
-    base_cidr = vpc_cidr_parts[0]
-    base_ip_parts = list(map(int, base_cidr.split('.')))
-    cidr_prefix = int(vpc_cidr_parts[1])
+    plan = plan_network(snapshot, subnets)
+    print_plan(plan)
+    if args.plan:
+        return plan
 
-    if cidr_prefix > 23: 
-         print("Error: VPC CIDR block must be at least /23 to accommodate /24 subnets.")
-         
-         return
-
-    subnet_cidr_prefix = 24
-
-    public_subnet_ids = []
-    for i in range(args.num_public_subnets):
-        if i >= len(availability_zones):
-            print(f"Warning: Not enough Availability Zones for all public subnets. Creating {len(availability_zones)} public subnets.")
-            break
-        subnet_cidr = f"{base_ip_parts[0]}.{base_ip_parts[1]}.{base_ip_parts[2] + i}.0/{subnet_cidr_prefix}"
-        subnet_id = create_subnet(ec2_client, vpc_id, subnet_cidr, availability_zones[i], is_public=True)
-        if subnet_id:
-            public_subnet_ids.append(subnet_id)
-            associate_route_table_with_subnet(ec2_client, public_route_table_id, subnet_id)
+    state = apply_plan(ec2_client, plan, snapshot, args.vpc_cidr, args.name, parse_tags(args.tag))
+    if not state:
+        return
 
-    
-    private_subnet_ids = []
-    for i in range(args.num_private_subnets):
-        if i + args.num_public_subnets >= len(availability_zones):
-             print(f"Warning: Not enough Availability Zones for all private subnets. Creating {len(availability_zones) - args.num_public_subnets} private subnets.")
-             break
-        subnet_cidr = f"{base_ip_parts[0]}.{base_ip_parts[1]}.{base_ip_parts[2] + args.num_public_subnets + i}.0/{subnet_cidr_prefix}"
-        subnet_id = create_subnet(ec2_client, vpc_id, subnet_cidr, availability_zones[args.num_public_subnets + i], is_public=False)
-        if subnet_id:
-            private_subnet_ids.append(subnet_id)
+    public_subnet_ids = [state['subnets'][s['cidr']] for s in subnets if s['public'] and s['cidr'] in state['subnets']]
+    private_subnet_ids = [state['subnets'][s['cidr']] for s in subnets if not s['public'] and s['cidr'] in state['subnets']]
 
     print("\nVPC creation process completed (simplified).")
-    print(f"VPC ID: {vpc_id}")
+    print(f"VPC ID: {state['vpc_id']}")
     print(f"Public Subnet IDs: {public_subnet_ids}")
     print(f"Private Subnet IDs: {private_subnet_ids}")
+    return plan
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,34 +1,121 @@
 import argparse
-import boto3
 import os
+import time
 import requests
+from botocore.exceptions import ClientError
+import lookup_cache
+from sg_rules import apply_rules, read_cidrs
+from task4_bonus.clients import get_client
+from task4_bonus.tagging import parse_tags, tag_specifications
+
+AMI_PARAMETER = '/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-x86_64'
+
+def fetch_public_ip():
+    response = requests.get('https://api.ipify.org')
+    response.raise_for_status() 
+    return response.text
 
 def get_public_ip():
+    # a LookupError (offline and not cached) is left to the caller, which must not fall back to 0.0.0.0/0
     try:
-        response = requests.get('https://api.ipify.org')
-        response.raise_for_status() 
-        return response.text
+        return lookup_cache.cached('public_ip', 3600, fetch_public_ip)
     except requests.exceptions.RequestException as e:
         print(f"Error getting public IP: {e}")
         return None
 
+def get_latest_ami(ssm, parameter=AMI_PARAMETER):
+    return lookup_cache.cached(
+        f"ami:{ssm.meta.region_name}:{parameter}",
+        24 * 3600,
+        lambda: ssm.get_parameter(Name=parameter)['Parameter']['Value']
+    )
+
+def get_root_device(ec2, ami_id):
+    return lookup_cache.cached(
+        f"root_device:{ec2.meta.region_name}:{ami_id}",
+        24 * 3600,
+        lambda: ec2.describe_images(ImageIds=[ami_id])['Images'][0]['RootDeviceName']
+    )
+
+def split_across_subnets(subnet_ids, count):
+    per_subnet, extra = divmod(count, len(subnet_ids))
+    for i, subnet_id in enumerate(subnet_ids):
+        subnet_count = per_subnet + (1 if i < extra else 0)
+        if subnet_count:
+            yield subnet_id, subnet_count
+
+def wait_for_running(ec2, instance_ids, delay=5, timeout=900):
+    pending = set(instance_ids)
+    public_ips = {}
+    deadline = time.monotonic() + timeout
+
+    while pending and time.monotonic() < deadline:
+        time.sleep(delay)
+        ids = sorted(pending)
+        for i in range(0, len(ids), 1000):
+            try:
+                response = ec2.describe_instances(InstanceIds=ids[i:i + 1000])
+            except ClientError as e:
+                # new instance IDs can take a moment to become visible
+                if e.response['Error']['Code'] == 'InvalidInstanceID.NotFound':
+                    continue
+                raise
+            for reservation in response['Reservations']:
+                for instance in reservation['Instances']:
+                    instance_id = instance['InstanceId']
+                    state = instance['State']['Name']
+                    if state == 'running':
+                        public_ips[instance_id] = instance.get('PublicIpAddress')
+                        print(f"Instance {instance_id} is now running. Public IP: {public_ips[instance_id] or 'none'}")
+                        pending.discard(instance_id)
+                    elif state in ('shutting-down', 'terminated', 'stopping', 'stopped'):
+                        print(f"Instance {instance_id} entered state '{state}'.")
+                        pending.discard(instance_id)
+
+    if pending:
+        raise TimeoutError(f"Instances not running after {timeout}s: {', '.join(sorted(pending))}")
+    return public_ips
+
 def main():
     parser = argparse.ArgumentParser(description="Create AWS VPC resources and launch an EC2 instance.")
     parser.add_argument("--vpc_id", required=True, help="The ID of the VPC to use.")
-    parser.add_argument("--subnet_id", required=True, help="The ID of the subnet to use.")
+    parser.add_argument("--subnet_id", required=True, nargs='+', help="The ID(s) of the subnet(s) to spread instances across.")
+    parser.add_argument("--count", type=int, default=1, help="Number of instances to launch.")
+    parser.add_argument("--ami_id", help="AMI to launch. Defaults to the latest Amazon Linux 2023 AMI.")
+    parser.add_argument("--tag", action="append", default=[], help="Tag every created resource with KEY=VALUE (repeatable).")
+    parser.add_argument("--ssh_cidrs_file", help="File of extra CIDRs (one per line) allowed to SSH in; merged before applying.")
+    lookup_cache.add_cache_arguments(parser)
 
     args = parser.parse_args()
+    lookup_cache.configure(args)
 
     vpc_id = args.vpc_id
-    subnet_id = args.subnet_id
+    subnet_ids = args.subnet_id
+    tags = parse_tags(args.tag)
 
-    ec2 = boto3.client('ec2')
+    ec2 = get_client('ec2')
+
+    ssh_cidrs = list(read_cidrs(args.ssh_cidrs_file)) if args.ssh_cidrs_file else []
+    try:
+        public_ip = get_public_ip()
+    except LookupError as e:
+        if not ssh_cidrs:
+            print(f"Error getting public IP: {e}. Run once online or pass --ssh_cidrs_file; SSH is not opened to 0.0.0.0/0 in offline mode.")
+            return
+        print(f"Public IP not cached ({e}); allowing SSH only from --ssh_cidrs_file.")
+        public_ip = None
+    if public_ip:
+        ssh_cidrs.append(f"{public_ip}/32")
+    elif not ssh_cidrs:
+        print("Could not get public IP, SSH access may not work.")
+        ssh_cidrs = ['0.0.0.0/0'] 
 
     try:
         security_group_response = ec2.create_security_group(
             Description='Security group for EC2 instance',
             GroupName='my-instance-security-group',
-            VpcId=vpc_id
+            VpcId=vpc_id,
+            TagSpecifications=tag_specifications('security-group', tags)
         )
         security_group_id = security_group_response['GroupId']
         print(f"Created security group with ID: {security_group_id}")
@@ -36,27 +123,11 @@ def main():
         print(f"Error creating security group: {e}")
         return
 
-    public_ip = get_public_ip()
-    if not public_ip:
-        print("Could not get public IP, SSH access may not work.")
-        ssh_cidr = '0.0.0.0/0' 
-    else:
-        ssh_cidr = f"{public_ip}/32" 
-
     try:
-        ec2.authorize_security_group_ingress(
-            GroupId=security_group_id,
-            IpPermissions=[
-                {'IpProtocol': 'tcp',
-                 'FromPort': 80,
-                 'ToPort': 80,
-                 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]},
-                {'IpProtocol': 'tcp',
-                 'FromPort': 22,
-                 'ToPort': 22,
-                 'IpRanges': [{'CidrIp': ssh_cidr}]}
-            ]
-        )
+        apply_rules(ec2, security_group_id, [
+            ('tcp', 80, 80, ['0.0.0.0/0']),
+            ('tcp', 22, 22, ssh_cidrs),
+        ])
         print("Configured inbound rules for HTTP and SSH.")
     except Exception as e:
         print(f"Error configuring inbound rules: {e}")
@@ -67,7 +138,7 @@ def main():
 
     key_pair_name = 'my-instance-key-pair'
     try:
-        key_pair_response = ec2.create_key_pair(KeyName=key_pair_name)
+        key_pair_response = ec2.create_key_pair(KeyName=key_pair_name, TagSpecifications=tag_specifications('key-pair', tags))
         private_key = key_pair_response['KeyMaterial']
        
         with open(f'{key_pair_name}.pem', 'w') as f:
@@ -81,60 +152,67 @@ def main():
         print(f"Deleted security group {security_group_id} due to error.")
         return
 
-    ami_id = 'ami-0abcdef1234567890'  
+    try:
+        ami_id = args.ami_id or get_latest_ami(get_client('ssm'))
+        # AL2023 uses /dev/xvda, older images /dev/sda1; the mapping must name the image's own root device
+        root_device = get_root_device(ec2, ami_id)
+    except (ClientError, LookupError, IndexError) as e:
+        print(f"Error looking up AMI: {e}")
+        ec2.delete_security_group(GroupId=security_group_id)
+        ec2.delete_key_pair(KeyName=key_pair_name)
+        print("Cleaned up resources due to error.")
+        return
 
+    instance_ids = []
     try:
-        instance_response = ec2.run_instances(
-            ImageId=ami_id,
-            InstanceType='t2.micro',
-            MinCount=1,
-            MaxCount=1,
-            NetworkInterfaces=[
-                {
-                    'DeviceIndex': 0,
-                    'SubnetId': subnet_id,
-                    'Groups': [security_group_id],
-                    'AssociatePublicIpAddress': True  
-                }
-            ],
-            BlockDeviceMappings=[
-                {
-                    'DeviceName': '/dev/sda1',  
-                    'Ebs': {
-                        'VolumeSize': 10,
-                        'VolumeType': 'gp2'
+        for subnet_id, count in split_across_subnets(subnet_ids, args.count):
+            instance_response = ec2.run_instances(
+                ImageId=ami_id,
+                InstanceType='t2.micro',
+                MinCount=1,
+                MaxCount=count,
+                NetworkInterfaces=[
+                    {
+                        'DeviceIndex': 0,
+                        'SubnetId': subnet_id,
+                        'Groups': [security_group_id],
+                        'AssociatePublicIpAddress': True  
                     }
-                }
-            ],
-            KeyName=key_pair_name
-        )
-        instance_id = instance_response['Instances'][0]['InstanceId']
-        print(f"Launched EC2 instance with ID: {instance_id}")
-
-        waiter = ec2.get_waiter('instance_running')
-        waiter.wait(InstanceIds=[instance_id])
-        print(f"Instance {instance_id} is now running.")
-
-        instance_description = ec2.describe_instances(InstanceIds=[instance_id])
-        public_ip_address = instance_description['Reservations'][0]['Instances'][0].get('PublicIpAddress')
-
-        if public_ip_address:
-            print(f"Instance public IP address: {public_ip_address}")
-            print("Please verify SSH access to the instance using the downloaded key pair.")
+                ],
+                BlockDeviceMappings=[
+                    {
+                        'DeviceName': root_device,
+                        'Ebs': {
+                            'VolumeSize': 10,
+                            'VolumeType': 'gp2'
+                        }
+                    }
+                ],
+                KeyName=key_pair_name,
+                TagSpecifications=tag_specifications('instance', tags) + tag_specifications('volume', tags)
+            )
+            launched = [instance['InstanceId'] for instance in instance_response['Instances']]
+            instance_ids.extend(launched)
+            print(f"Launched {len(launched)} EC2 instance(s) in subnet {subnet_id}: {', '.join(launched)}")
+
+        public_ips = wait_for_running(ec2, instance_ids)
+
+        if any(public_ips.values()):
+            print("Please verify SSH access to the instances using the downloaded key pair.")
         else:
-            print("Instance did not receive a public IP address.")
+            print("Instances did not receive a public IP address.")
 
     except Exception as e:
         print(f"Error launching EC2 instance: {e}")
     
+        if instance_ids:
+             ec2.terminate_instances(InstanceIds=instance_ids)
+             print(f"Terminated instances {', '.join(instance_ids)} due to error.")
+             ec2.get_waiter('instance_terminated').wait(InstanceIds=instance_ids)
+
         ec2.delete_security_group(GroupId=security_group_id)
         ec2.delete_key_pair(KeyName=key_pair_name)
-        
-        if 'instance_id' in locals():
-             ec2.terminate_instances(InstanceIds=[instance_id])
-             print(f"Terminated instance {instance_id} due to error.")
-        print(f"Cleaned up resources due to error.")
-
+        print("Cleaned up resources due to error.")
 
 if __name__ == "__main__":
     main()
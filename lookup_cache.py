@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from os import getenv
+
+CACHE_PATH = getenv("LOOKUP_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "aws-lookups.json"))
+
+_lock = threading.Lock()
+offline = getenv("LOOKUP_CACHE_OFFLINE", "") == "1"
+
+
+def _load():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(entries):
+    directory = os.path.dirname(CACHE_PATH)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def get(key):
+    """Return the cached value for ``key`` or None if it is missing or expired.
+
+    In offline mode expired entries are still returned and a missing entry
+    raises LookupError.
+    """
+    with _lock:
+        entry = _load().get(key)
+    if entry and (offline or time.time() - entry["stored"] < entry["ttl"]):
+        return entry["value"]
+    if offline:
+        raise LookupError(f"'{key}' is not cached and offline mode is on")
+    return None
+
+
+def put(key, value, ttl):
+    with _lock:
+        entries = _load()
+        entries[key] = {"value": value, "stored": time.time(), "ttl": ttl}
+        _save(entries)
+
+
+def cached(key, ttl, fetch):
+    value = get(key)
+    if value is None:
+        value = fetch()
+        if value is not None:
+            put(key, value, ttl)
+    return value
+
+
+def invalidate(prefix=""):
+    with _lock:
+        entries = _load()
+        kept = {key: entry for key, entry in entries.items() if not key.startswith(prefix)}
+        if len(kept) != len(entries):
+            _save(kept)
+
+
+def add_cache_arguments(parser):
+    parser.add_argument("--offline", action="store_true", help="Only use cached lookups, never call the network for them")
+    parser.add_argument("--refresh-cache", action="store_true", help="Drop cached lookups before running")
+
+
+def configure(args):
+    global offline
+    offline = offline or args.offline
+    if args.refresh_cache:
+        invalidate()
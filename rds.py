@@ -1,32 +1,43 @@
 import argparse
-import boto3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
+from task4_bonus.clients import get_client
+from task4_bonus.tagging import parse_tags, tag_list, tag_specifications
+from sg_rules import apply_rules, check_quota, compile_rules, read_cidrs
+
+def create_security_group(ec2_client, sg_name, description, tags=None, cidrs=('0.0.0.0/0',)):
+    rules = [('tcp', 3306, 3306, list(cidrs))]
+    try:
+        # an oversized CIDR list is rejected before the group exists
+        check_quota(sg_name, [cidr for merged in compile_rules(rules).values() for cidr in merged])
+    except ValueError as e:
+        print(e)
+        return None
 
-def create_security_group(ec2_client, sg_name, description):
     try:
         response = ec2_client.create_security_group(
             GroupName=sg_name,
-            Description=description
+            Description=description,
+            TagSpecifications=tag_specifications('security-group', tags)
         )
         sg_id = response['GroupId']
         print(f"Security Group Created: {sg_id}")
+    except ClientError as e:
+        print(e)
+        return None
 
-        ec2_client.authorize_security_group_ingress(
-            GroupId=sg_id,
-            IpPermissions=[
-                {'IpProtocol': 'tcp',
-                 'FromPort': 3306,
-                 'ToPort': 3306,
-                 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}
-            ]
-        )
-        print("Ingress rule added for MySQL port 3306.")
+    try:
+        apply_rules(ec2_client, sg_id, rules)
+        print("Ingress rules added for MySQL port 3306.")
         return sg_id
-    except ClientError as e:
+    except (ClientError, ValueError) as e:
         print(e)
+        ec2_client.delete_security_group(GroupId=sg_id)
+        print(f"Deleted security group {sg_id} due to error.")
         return None
 
-def create_rds_instance(rds_client, instance_identifier, master_username, master_password, sg_id):
+def create_rds_instance(rds_client, instance_identifier, master_username, master_password, sg_id, backup_retention=1, tags=None):
     try:
         response = rds_client.create_db_instance(
             DBInstanceIdentifier=instance_identifier,
@@ -37,7 +48,9 @@ def create_rds_instance(rds_client, instance_identifier, master_username, master
             MasterUserPassword=master_password,
             VpcSecurityGroupIds=[sg_id],
             PubliclyAccessible=True, 
-            StorageType='gp2' 
+            StorageType='gp2',
+            BackupRetentionPeriod=backup_retention,
+            Tags=tag_list(tags)
         )
         print(f"RDS instance {instance_identifier} creation initiated.")
         return response['DBInstance']
@@ -45,43 +58,167 @@ def create_rds_instance(rds_client, instance_identifier, master_username, master
         print(e)
         return None
 
+def create_read_replica(rds_client, replica_identifier, source_identifier, tags=None):
+    try:
+        response = rds_client.create_db_instance_read_replica(
+            DBInstanceIdentifier=replica_identifier,
+            SourceDBInstanceIdentifier=source_identifier,
+            DBInstanceClass='db.t3.large',
+            PubliclyAccessible=True,
+            Tags=tag_list(tags)
+        )
+        print(f"Read replica {replica_identifier} of {source_identifier} creation initiated.")
+        return response['DBInstance']
+    except ClientError as e:
+        print(e)
+        return None
+
+def create_in_parallel(create, identifiers, max_workers=10):
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(create, identifiers))
+    return [identifier for identifier, result in zip(identifiers, results) if result]
+
+FAILED_STATES = {'failed', 'incompatible-parameters', 'incompatible-network', 'incompatible-restore',
+                 'inaccessible-encryption-credentials', 'storage-full', 'deleting'}
+
+def wait_for_instances(rds_client, instance_identifiers, delay=15, max_delay=60, timeout=3600):
+    pending = set(instance_identifiers)
+    endpoints = {}
+    deadline = time.monotonic() + timeout
+    paginator = rds_client.get_paginator('describe_db_instances')
+
+    while pending and time.monotonic() < deadline:
+        time.sleep(delay)
+        ids = sorted(pending)
+        for i in range(0, len(ids), 100):
+            filters = [{'Name': 'db-instance-id', 'Values': ids[i:i + 100]}]
+            try:
+                for page in paginator.paginate(Filters=filters):
+                    for instance in page['DBInstances']:
+                        identifier = instance['DBInstanceIdentifier']
+                        status = instance['DBInstanceStatus']
+                        if status == 'available' and instance.get('Endpoint'):
+                            endpoints[identifier] = instance['Endpoint']['Address']
+                            print(f"RDS instance {identifier} is available. Endpoint: {endpoints[identifier]}")
+                            pending.discard(identifier)
+                        elif status in FAILED_STATES:
+                            print(f"RDS instance {identifier} ended in state '{status}'.")
+                            pending.discard(identifier)
+            except ClientError as e:
+                print(f"Error polling RDS instances: {e}")
+        delay = min(delay * 2, max_delay)
+
+    for identifier in sorted(pending):
+        print(f"Timed out waiting for RDS instance {identifier}.")
+    return endpoints
+
+def create_db_subnet_group(rds_client, name, subnet_ids, tags=None):
+    rds_client.create_db_subnet_group(
+        DBSubnetGroupName=name,
+        DBSubnetGroupDescription=f'Subnets for {name}',
+        SubnetIds=subnet_ids,
+        Tags=tag_list(tags)
+    )
+    print(f"DB subnet group {name} created.")
+    return name
+
+def create_rds_security_group(ec2_client, sg_name, vpc_id, tags=None):
+    response = ec2_client.create_security_group(
+        GroupName=sg_name,
+        Description='MySQL access for RDS',
+        VpcId=vpc_id,
+        TagSpecifications=tag_specifications('security-group', tags)
+    )
+    print(f"Security Group Created: {response['GroupId']}")
+    return response['GroupId']
+
+def add_mysql_access_sg(ec2_client, sg_id, source_sg_id):
+    # MySQL is only reachable from members of source_sg_id, e.g. the bastion host
+    try:
+        ec2_client.authorize_security_group_ingress(
+            GroupId=sg_id,
+            IpPermissions=[{'IpProtocol': 'tcp', 'FromPort': 3306, 'ToPort': 3306,
+                            'UserIdGroupPairs': [{'GroupId': source_sg_id}]}]
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'InvalidPermission.Duplicate':
+            raise
+    print(f"MySQL on {sg_id} allowed from {source_sg_id}.")
+
+def create_db_instance(rds_client, sg_id, subnet_group_name, instance_identifier='bastion-db-instance', tags=None):
+    # the master password is generated and kept in Secrets Manager by RDS
+    response = rds_client.create_db_instance(
+        DBInstanceIdentifier=instance_identifier,
+        Engine='mysql',
+        DBInstanceClass='db.t3.micro',
+        AllocatedStorage=20,
+        MasterUsername='admin',
+        ManageMasterUserPassword=True,
+        DBSubnetGroupName=subnet_group_name,
+        VpcSecurityGroupIds=[sg_id],
+        PubliclyAccessible=False,
+        Tags=tag_list(tags)
+    )
+    print(f"RDS instance {instance_identifier} creation initiated.")
+    return response['DBInstance']
+
 def main():
-    parser = argparse.ArgumentParser(description='Create an AWS RDS instance and Security Group.')
-    parser.add_argument('--instance-identifier', required=True, help='Identifier for the RDS instance.')
+    parser = argparse.ArgumentParser(description='Create AWS RDS instances and a Security Group.')
+    parser.add_argument('--instance-identifier', required=True, nargs='+', help='Identifier(s) for the RDS instance(s).')
     parser.add_argument('--master-username', required=True, help='Master username for the RDS instance.')
     parser.add_argument('--master-password', required=True, help='Master password for the RDS instance.')
     parser.add_argument('--security-group-name', required=True, help='Name for the new Security Group.')
     parser.add_argument('--security-group-description', default='Security group for RDS instance', help='Description for the new Security Group.')
+    parser.add_argument('--no-wait', action='store_true', help='Return as soon as the create requests are submitted.')
+    parser.add_argument('--count', type=int, default=1, help='Create this many instances per identifier (<identifier>-1 ... -N).')
+    parser.add_argument('--replicas', type=int, default=0, help='Create this many read replicas of each instance.')
+    parser.add_argument('--workers', type=int, default=10, help='Number of create requests to send at once.')
+    parser.add_argument('--tag', action='append', default=[], help='Tag every created resource with KEY=VALUE (repeatable).')
+    parser.add_argument('--allow-cidrs-file', help='Only allow MySQL from the CIDRs in this file (one per line) instead of 0.0.0.0/0.')
 
     args = parser.parse_args()
 
-    ec2_client = boto3.client('ec2')
-    rds_client = boto3.client('rds')
+    ec2_client = get_client('ec2')
+    rds_client = get_client('rds', max_workers=args.workers)
     
-    sg_id = create_security_group(ec2_client, args.security_group_name, args.security_group_description)
+    tags = parse_tags(args.tag)
+    cidrs = list(read_cidrs(args.allow_cidrs_file)) if args.allow_cidrs_file else ['0.0.0.0/0']
+    sg_id = create_security_group(ec2_client, args.security_group_name, args.security_group_description, tags, cidrs)
 
     if sg_id:
         
-        rds_instance = create_rds_instance(
-            rds_client,
-            args.instance_identifier,
-            args.master_username,
-            args.master_password,
-            sg_id
+        identifiers = args.instance_identifier
+        if args.count > 1:
+            identifiers = [f"{identifier}-{i}" for identifier in identifiers for i in range(1, args.count + 1)]
+
+        submitted = create_in_parallel(
+            lambda identifier: create_rds_instance(
+                rds_client,
+                identifier,
+                args.master_username,
+                args.master_password,
+                sg_id,
+                tags=tags
+            ),
+            identifiers,
+            args.workers
         )
 
-        if rds_instance:
-            print("Waiting for RDS instance to become available...")
-            waiter = rds_client.get_waiter('db_instance_available')
-            try:
-                waiter.wait(DBInstanceIdentifier=args.instance_identifier)
-                print(f"RDS instance {args.instance_identifier} is available.")
-                
-                instance_description = rds_client.describe_db_instances(DBInstanceIdentifier=args.instance_identifier)['DBInstances'][0]
-                endpoint = instance_description['Endpoint']['Address']
-                print(f"RDS Endpoint: {endpoint}")
-            except ClientError as e:
-                print(f"Error waiting for instance to become available: {e}")
+        if submitted and args.replicas:
+            # replicas can only be created once their source is available
+            print(f"Waiting for {len(submitted)} primary instance(s) before creating replicas...")
+            primaries = wait_for_instances(rds_client, submitted)
+            replicas = [(f"{primary}-replica-{i}", primary) for primary in primaries for i in range(1, args.replicas + 1)]
+            submitted = create_in_parallel(
+                lambda replica: create_read_replica(rds_client, *replica, tags=tags),
+                replicas,
+                args.workers
+            )
+            submitted = [replica for replica, _ in submitted]
+
+        if submitted and not args.no_wait:
+            print(f"Waiting for {len(submitted)} RDS instance(s) to become available...")
+            wait_for_instances(rds_client, submitted)
 
 if __name__ == '__main__':
     main()
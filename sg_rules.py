@@ -0,0 +1,177 @@
+import argparse
+import ipaddress
+from task4_bonus.clients import get_client
+
+# inbound rules per security group, counted separately for IPv4 and IPv6
+DEFAULT_MAX_RULES = 60
+
+
+def read_cidrs(path):
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                yield line
+
+
+def collapse(cidrs):
+    """Merge overlapping and adjacent ranges; bare addresses become /32 or /128."""
+    networks = {4: [], 6: []}
+    for cidr in cidrs:
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+        networks[network.version].append(network)
+    return [str(network) for version in (4, 6) for network in ipaddress.collapse_addresses(networks[version])]
+
+
+def compile_rules(rules):
+    """Turn [(protocol, from_port, to_port, cidrs)] into {(protocol, from_port, to_port): [cidr]}.
+
+    Rules for the same port range are combined before collapsing.
+    """
+    merged = {}
+    for protocol, from_port, to_port, cidrs in rules:
+        merged.setdefault((protocol, from_port, to_port), []).extend(cidrs)
+    return {key: collapse(cidrs) for key, cidrs in merged.items()}
+
+
+def current_rules(ec2_client, group_id):
+    """Return {(protocol, from_port, to_port): {cidr: rule_id}} for the group's CIDR ingress rules."""
+    rules = {}
+    paginator = ec2_client.get_paginator('describe_security_group_rules')
+    for page in paginator.paginate(Filters=[{'Name': 'group-id', 'Values': [group_id]}]):
+        for rule in page['SecurityGroupRules']:
+            cidr = rule.get('CidrIpv4') or rule.get('CidrIpv6')
+            if rule['IsEgress'] or not cidr:
+                continue
+            if rule['IpProtocol'] == '-1':
+                key = ('-1', None, None)
+            else:
+                key = (rule['IpProtocol'], rule.get('FromPort'), rule.get('ToPort'))
+            rules.setdefault(key, {})[cidr] = rule['SecurityGroupRuleId']
+    return rules
+
+
+def diff_rules(desired, current):
+    """Return ({key: [cidr]} to authorize, [rule_id] to revoke).
+
+    Only the port ranges present in ``desired`` are managed; rules for other
+    ports are left alone.
+    """
+    authorize = {}
+    revoke = []
+    for key, cidrs in desired.items():
+        existing = current.get(key, {})
+        missing = [cidr for cidr in cidrs if cidr not in existing]
+        if missing:
+            authorize[key] = missing
+        revoke.extend(rule_id for cidr, rule_id in existing.items() if cidr not in cidrs)
+    return authorize, revoke
+
+
+def count_by_version(cidrs):
+    counts = {4: 0, 6: 0}
+    for cidr in cidrs:
+        counts[ipaddress.ip_network(cidr).version] += 1
+    return counts
+
+
+def check_quota(group, cidrs, max_rules=DEFAULT_MAX_RULES):
+    """Raise ValueError if ``cidrs`` need more ingress rules than ``max_rules`` for either IP version."""
+    for version, count in count_by_version(cidrs).items():
+        if count > max_rules:
+            raise ValueError(f"{group} would need {count} IPv{version} ingress rules, quota is {max_rules}")
+
+
+def ip_permission(key, cidrs):
+    protocol, from_port, to_port = key
+    permission = {
+        'IpProtocol': protocol,
+        'IpRanges': [{'CidrIp': cidr} for cidr in cidrs if ':' not in cidr],
+        'Ipv6Ranges': [{'CidrIpv6': cidr} for cidr in cidrs if ':' in cidr],
+    }
+    if from_port is not None:
+        permission['FromPort'] = from_port
+        permission['ToPort'] = to_port
+    return permission
+
+
+def apply_rules(ec2_client, group_id, rules, batch_size=100, max_rules=DEFAULT_MAX_RULES, dry_run=False):
+    """Make the group's ingress for the given port ranges match ``rules`` exactly.
+
+    Only the difference is sent, ``batch_size`` CIDRs per authorize/revoke
+    call. Raises ValueError before changing anything if the result would not
+    fit in ``max_rules``. Returns (authorized, revoked) counts.
+    """
+    desired = compile_rules(rules)
+    current = current_rules(ec2_client, group_id)
+    authorize, revoke = diff_rules(desired, current)
+
+    # rules for ports we do not manage still count towards the quota
+    kept = [cidr for key, cidrs in current.items() if key not in desired for cidr in cidrs]
+    final_cidrs = kept + [cidr for cidrs in desired.values() for cidr in cidrs]
+    check_quota(group_id, final_cidrs, max_rules)
+    final = count_by_version(final_cidrs)
+
+    added = sum(len(cidrs) for cidrs in authorize.values())
+    print(f"{group_id}: {added} rule(s) to authorize, {len(revoke)} to revoke, "
+          f"{sum(final.values())} after applying")
+    if dry_run:
+        for key, cidrs in authorize.items():
+            print(f"  + {key[0]} {key[1]}-{key[2]} {', '.join(cidrs)}")
+        for rule_id in revoke:
+            print(f"  - {rule_id}")
+        return added, len(revoke)
+
+    def authorize_all():
+        for key, cidrs in authorize.items():
+            for i in range(0, len(cidrs), batch_size):
+                ec2_client.authorize_security_group_ingress(
+                    GroupId=group_id, IpPermissions=[ip_permission(key, cidrs[i:i + batch_size])]
+                )
+
+    def revoke_all():
+        for i in range(0, len(revoke), batch_size):
+            ec2_client.revoke_security_group_ingress(GroupId=group_id, SecurityGroupRuleIds=revoke[i:i + batch_size])
+
+    # authorize first so access never lapses, unless the new rules only fit once the old ones are gone
+    current_count = count_by_version([cidr for cidrs in current.values() for cidr in cidrs])
+    added_count = count_by_version([cidr for cidrs in authorize.values() for cidr in cidrs])
+    if any(current_count[v] + added_count[v] > max_rules for v in (4, 6)):
+        revoke_all()
+        authorize_all()
+    else:
+        authorize_all()
+        revoke_all()
+    return added, len(revoke)
+
+
+def parse_rule(text):
+    """Parse PROTOCOL:PORT[-PORT]=CIDR[,CIDR...] where a CIDR of @FILE reads one per line."""
+    ports, _, sources = text.partition('=')
+    protocol, _, port_range = ports.partition(':')
+    from_port, _, to_port = port_range.partition('-')
+    cidrs = []
+    for source in sources.split(','):
+        cidrs.extend(read_cidrs(source[1:]) if source.startswith('@') else [source])
+    if protocol == '-1':
+        return protocol, None, None, cidrs
+    return protocol, int(from_port), int(to_port or from_port), cidrs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync a security group's CIDR ingress rules with a compiled rule list.")
+    parser.add_argument('--group-id', required=True)
+    parser.add_argument('--rule', action='append', required=True, type=parse_rule,
+                        help='PROTOCOL:PORT[-PORT]=CIDR[,CIDR|@FILE...], e.g. tcp:443=@partners.txt (repeatable).')
+    parser.add_argument('--region')
+    parser.add_argument('--batch-size', type=int, default=100, help='CIDRs per authorize/revoke call.')
+    parser.add_argument('--max-rules', type=int, default=DEFAULT_MAX_RULES, help='Inbound rule quota per group and IP version.')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the changes.')
+    args = parser.parse_args()
+
+    ec2_client = get_client('ec2', args.region)
+    apply_rules(ec2_client, args.group_id, args.rule, args.batch_size, args.max_rules, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,17 @@
 import typer
 import argparse
-import boto3
 import magic
 import io
 import logging
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
 from os import getenv
 from dotenv import load_dotenv
+from task4_bonus.clients import get_client, get_session
 import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from task4_bonus.presign import UrlSigner, object_url
+from task4_bonus.regions import enabled_regions, fan_out, print_region_report
 
 load_dotenv()
 
@@ -16,14 +20,10 @@ app = typer.Typer()
 def init_client():
 
     try:
-        client = boto3.client("s3",
-                aws_access_key_id=getenv("aws_access_key_id"),
-                aws_secret_access_key=getenv("aws_secret_access_key"),
-                aws_session_token=getenv("aws_session_token"),
-                region_name=getenv("aws_region_name")
-                )
+        client = get_client("s3", getenv("aws_region_name"))
     
-        client.list_buckets()
+        # probe without retries, so a missing network fails fast
+        get_client("s3", getenv("aws_region_name"), max_attempts=1).list_buckets()
 
         return client
     
@@ -32,14 +32,35 @@ def init_client():
     except:
         print("Undefined error")
 
-aws_client = init_client()
+_aws_client = None
+
+def s3_client():
+    # created on first use, so commands that only sign URLs locally make no requests
+    global _aws_client
+    if _aws_client is None:
+        _aws_client = init_client()
+    return _aws_client
+
+def list_region_buckets(region):
+    client = get_client("s3", region)
+    paginator = client.get_paginator("list_buckets")
+    return [bucket["Name"] for page in paginator.paginate(BucketRegion=region) for bucket in page.get("Buckets", [])]
 
 @app.command()
-def list_buckets():
+def list_buckets(all_regions: bool = False):
+
+    if all_regions:
+        report = []
+        for region, names, seconds, error in fan_out(list_region_buckets, enabled_regions()):
+            for name in names or []:
+                print(f"{region}\t{name}")
+            report.append((region, len(names or []), seconds, error))
+        print_region_report(report)
+        return
 
     try:
        
-       buckets = aws_client.list_buckets()
+       buckets = s3_client().list_buckets()
        if buckets:
            for bucket in buckets["Buckets"]:
                print(f'{bucket["Name"]}')
@@ -47,11 +68,116 @@ def list_buckets():
     except ClientError as e:
         logging.error(e)
 
+NOT_CONFIGURED = {
+    "NoSuchBucketPolicy",
+    "NoSuchPublicAccessBlockConfiguration",
+    "NoSuchLifecycleConfiguration",
+    "ServerSideEncryptionConfigurationNotFoundError",
+}
+
+def audit_versioning(client, bucket_name):
+    response = client.get_bucket_versioning(Bucket=bucket_name)
+    status = response.get("Status", "Disabled")
+    return f"{status}, MFA delete" if response.get("MFADelete") == "Enabled" else status
+
+def is_public_principal(principal):
+    # "*", {"AWS": "*"} and {"AWS": ["*", ...]} all grant access to everyone
+    if principal == "*":
+        return True
+    aws = principal.get("AWS") if isinstance(principal, dict) else None
+    return aws == "*" or (isinstance(aws, list) and "*" in aws)
+
+def audit_policy(client, bucket_name):
+    policy = json.loads(client.get_bucket_policy(Bucket=bucket_name)["Policy"])
+    statements = policy.get("Statement", [])
+    public = any(
+        statement.get("Effect") == "Allow" and is_public_principal(statement.get("Principal"))
+        for statement in (statements if isinstance(statements, list) else [statements])
+    )
+    return "public" if public else "present"
+
+def audit_public_access_block(client, bucket_name):
+    config = client.get_public_access_block(Bucket=bucket_name)["PublicAccessBlockConfiguration"]
+    enabled = sum(bool(value) for value in config.values())
+    return "blocked" if enabled == len(config) else f"partial ({enabled}/{len(config)})"
+
+def audit_lifecycle(client, bucket_name):
+    rules = client.get_bucket_lifecycle_configuration(Bucket=bucket_name)["Rules"]
+    expirations = sorted({rule["Expiration"]["Days"] for rule in rules if rule.get("Status") == "Enabled" and "Days" in rule.get("Expiration", {})})
+    expires = f", expire {'/'.join(map(str, expirations))}d" if expirations else ""
+    return f"{len(rules)} rule(s){expires}"
+
+def audit_encryption(client, bucket_name):
+    rules = client.get_bucket_encryption(Bucket=bucket_name)["ServerSideEncryptionConfiguration"]["Rules"]
+    return ",".join(rule["ApplyServerSideEncryptionByDefault"]["SSEAlgorithm"] for rule in rules if "ApplyServerSideEncryptionByDefault" in rule) or "none"
+
+AUDIT_CHECKS = {
+    "versioning": audit_versioning,
+    "policy": audit_policy,
+    "public_access_block": audit_public_access_block,
+    "lifecycle": audit_lifecycle,
+    "encryption": audit_encryption,
+}
+
+def run_check(bucket_name, region, check, workers):
+    try:
+        return AUDIT_CHECKS[check](get_client("s3", region, max_workers=workers), bucket_name)
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        return "none" if code in NOT_CONFIGURED else f"error: {code}"
+    except BotoCoreError as e:
+        # e.g. EndpointConnectionError for a region that cannot be reached
+        return f"error: {type(e).__name__}"
+
+def list_bucket_regions():
+    # ListBuckets reports each bucket's region, saving a GetBucketLocation per bucket
+    paginator = s3_client().get_paginator("list_buckets")
+    buckets = {}
+    for page in paginator.paginate():
+        for bucket in page.get("Buckets", []):
+            buckets[bucket["Name"]] = bucket.get("BucketRegion")
+    return buckets
+
+def bucket_location(bucket_name):
+    try:
+        return bucket_region(bucket_name)
+    except (ClientError, BotoCoreError):
+        return None
+
+@app.command()
+def audit(output: str = "table", workers: int = 32, prefix: str = ""):
+    """Report versioning, policy, public access block, lifecycle, encryption and region for every bucket."""
+    buckets = {name: region for name, region in list_bucket_regions().items() if name.startswith(prefix)}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        missing = [name for name, region in buckets.items() if not region]
+        for name, region in zip(missing, pool.map(bucket_location, missing)):
+            buckets[name] = region
+
+        # one task per (bucket, check), each against a client in the bucket's own region
+        tasks = [(name, region, check) for name, region in buckets.items() if region for check in AUDIT_CHECKS]
+        results = pool.map(lambda task: run_check(*task, workers), tasks)
+        report = {name: {"bucket": name, "region": region or "unknown"} for name, region in sorted(buckets.items())}
+        for (name, _, check), result in zip(tasks, results):
+            report[name][check] = result
+
+    rows = list(report.values())
+    if output == "json":
+        print(json.dumps(rows, indent=2))
+        return
+
+    columns = ["bucket", "region", *AUDIT_CHECKS]
+    widths = {column: max([len(column)] + [len(row.get(column, "")) for row in rows]) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(row.get(column, "").ljust(widths[column]) for column in columns))
+    print(f"\n{len(rows)} bucket(s) audited", file=sys.stderr)
+
 @app.command()
 def create_bucket(bucket_name:str, region="us-west-2"):
     try:
         location = {"LocationConstraint": region}
-        aws_client.create_bucket(Bucket=bucket_name, CreateBucketConfiguration=location)
+        s3_client().create_bucket(Bucket=bucket_name, CreateBucketConfiguration=location)
         print("Bucket successfully created!")
     except ClientError as e:
         logging.error(e)
@@ -59,14 +185,14 @@ def create_bucket(bucket_name:str, region="us-west-2"):
 @app.command()
 def delete_bucket(bucket_name):
     try:
-        aws_client.delete_bucket(Bucket=bucket_name)
+        s3_client().delete_bucket(Bucket=bucket_name)
     except ClientError as e:
         logging.error(e)
 
 @app.command()
 def bucket_exists(bucket_name):
     try:
-        aws_client.head_bucket(Bucket=bucket_name)
+        s3_client().head_bucket(Bucket=bucket_name)
         print(f"Bucket '{bucket_name}' exists")
         return True
     except ClientError as e:
@@ -80,7 +206,7 @@ def bucket_exists(bucket_name):
 @app.command()
 def set_object_access_policy(bucket_name, file_name):
     try:
-        response = aws_client.put_object_acl(ACL="public-read", Bucket=bucket_name, Key=file_name)
+        response = s3_client().put_object_acl(ACL="public-read", Bucket=bucket_name, Key=file_name)
         status_code = response["ResponseMetadata"]["HTTPStatusCode"]
         if status_code == 200:
             print("Yes, bucket exists and ACL granted")
@@ -106,14 +232,14 @@ def generate_public_read_policy(bucket_name):
 
 @app.command()
 def create_bucket_policy(bucket_name):
-     aws_client.delete_public_access_block(Bucket=bucket_name)
-     aws_client.put_bucket_policy(Bucket=bucket_name, Policy=generate_public_read_policy(bucket_name))
+     s3_client().delete_public_access_block(Bucket=bucket_name)
+     s3_client().put_bucket_policy(Bucket=bucket_name, Policy=generate_public_read_policy(bucket_name))
      print("Bucket succesfully have policy now")
 
 @app.command()
 def read_bucket_policy(bucket_name):
     try:
-        policy = aws_client.get_bucket_policy(Bucket=bucket_name)
+        policy = s3_client().get_bucket_policy(Bucket=bucket_name)
         policy_str = policy["Policy"]
         print(policy_str)
     except ClientError as e:
@@ -139,7 +265,7 @@ def download_file_and_upload_to_s3(bucket_name:str, url:str, file_name:str, keep
             print(f"Unsupported file type: {mime_type}. Supported types: .bmp, .jpg, .jpeg, .png, .webp, .mp4")
 
         try:
-            aws_client.upload_fileobj(
+            s3_client().upload_fileobj(
                 Fileobj=io.BytesIO(content),
                 Bucket=bucket_name,
                 ExtraArgs={'ContentType': mime_type},
@@ -147,12 +273,67 @@ def download_file_and_upload_to_s3(bucket_name:str, url:str, file_name:str, keep
             print("Object(image) uploaded successfully!")
         except Exception as e:
             print(e)
+            return None
 
     if keep_local:
         with open(file_name, mode='wb') as file:
             file.write(content)
 
-    return f"https://s3-us-west-2.amazonaws.com/btu-classroom-11/file_example_JPG_100kB.jpg"
+    url = object_url(bucket_name, file_name, bucket_region(bucket_name))
+    print(url)
+    return url
+
+def bucket_region(bucket_name):
+    location = s3_client().get_bucket_location(Bucket=bucket_name)["LocationConstraint"]
+    # legacy buckets report eu-west-1 as "EU" and us-east-1 as null
+    return {None: "us-east-1", "": "us-east-1", "EU": "eu-west-1"}.get(location, location)
+
+def iter_keys(bucket_name, prefix, keys_file):
+    if keys_file:
+        with (sys.stdin if keys_file == "-" else open(keys_file)) as f:
+            for line in f:
+                key = line.rstrip("\n")
+                if key:
+                    yield key
+        return
+    paginator = s3_client().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"]
+
+@app.command()
+def presign_urls(bucket_name: str, prefix: str = "", keys_file: str = None, region: str = None,
+                 expires: int = 3600, output: str = None):
+    """Print "key<TAB>presigned GET URL" for every key under PREFIX or listed in KEYS_FILE ('-' for stdin).
+
+    With --keys-file and --region no AWS call is made; URLs are signed locally.
+    """
+    if expires > 7 * 24 * 3600:
+        raise typer.BadParameter("presigned URLs are valid for at most 7 days", param_hint="--expires")
+
+    credentials = get_session().get_credentials()
+    if credentials is None:
+        raise NoCredentialsError()
+    credentials = credentials.get_frozen_credentials()
+    signer = UrlSigner(
+        credentials.access_key,
+        credentials.secret_key,
+        region or bucket_region(bucket_name),
+        bucket_name,
+        expires=expires,
+        token=credentials.token,
+    )
+
+    out = open(output, "w") if output else sys.stdout
+    count = 0
+    try:
+        for key in iter_keys(bucket_name, prefix, keys_file):
+            out.write(f"{key}\t{signer.sign(key)}\n")
+            count += 1
+    finally:
+        if output:
+            out.close()
+    print(f"Signed {count} URL(s) valid for {expires}s", file=sys.stderr)
 
 
 if __name__ == "__main__":
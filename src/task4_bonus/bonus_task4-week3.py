@@ -1,6 +1,6 @@
 import typer
 import argparse
-import boto3, os, sys
+import os, sys
 from collections import defaultdict
 import magic
 import io
@@ -8,7 +8,12 @@ import logging
 from botocore.exceptions import ClientError
 from os import getenv
 from dotenv import load_dotenv
+from task4_bonus.clients import get_client
+from task4_bonus.profiling import profile_calls
+from task4_bonus.workers import run_bounded
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from boto3.s3.transfer import TransferConfig
 
 load_dotenv()
@@ -18,14 +23,10 @@ app = typer.Typer()
 def init_client():
 
     try:
-        client = boto3.client("s3",
-                aws_access_key_id=getenv("aws_access_key_id"),
-                aws_secret_access_key=getenv("aws_secret_access_key"),
-                aws_session_token=getenv("aws_session_token"),
-                region_name=getenv("aws_region_name")
-                )
+        client = get_client("s3", getenv("aws_region_name"))
     
-        client.list_buckets()
+        # probe without retries, so a missing network fails fast
+        get_client("s3", getenv("aws_region_name"), max_attempts=1).list_buckets()
 
         return client
     
@@ -37,18 +38,98 @@ def init_client():
 aws_client = init_client()
 
 @app.command()
-def move_files(bucket):
+def move_files(bucket, profile_calls_: bool = typer.Option(False, "--profile-calls"), call_trace: str = None):
     ext_count = defaultdict(int)
 
-    for obj in aws_client.list_objects_v2(Bucket=bucket).get('Contents', []):
-        ext = os.path.splitext(obj['Key'])[1][1:]
-        if ext:
-            aws_client.copy_object(Bucket=bucket, CopySource={'Bucket': bucket, 'Key': obj['Key']}, Key=f"{ext}/{obj['Key']}")
-            aws_client.delete_object(Bucket=bucket, Key=obj['Key'])
-            ext_count[ext] += 1
+    with profile_calls(profile_calls_, call_trace):
+        for obj in aws_client.list_objects_v2(Bucket=bucket).get('Contents', []):
+            ext = os.path.splitext(obj['Key'])[1][1:]
+            if ext:
+                aws_client.copy_object(Bucket=bucket, CopySource={'Bucket': bucket, 'Key': obj['Key']}, Key=f"{ext}/{obj['Key']}")
+                aws_client.delete_object(Bucket=bucket, Key=obj['Key'])
+                ext_count[ext] += 1
 
     print('\n'.join(f"{ext} - {count}" for ext, count in ext_count.items()))
 
+MAX_SINGLE_COPY = 5 * 1024 ** 3
+
+def list_objects(client, bucket, prefix=""):
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get('Contents', [])
+
+def multipart_copy(client, part_pool, src_bucket, src_key, dest_bucket, dest_key, size, etag):
+    head = client.head_object(Bucket=src_bucket, Key=src_key)
+    # copying with the source's part size reproduces its multipart ETag
+    if '-' in etag:
+        part_size = client.head_object(Bucket=src_bucket, Key=src_key, PartNumber=1)['ContentLength']
+    else:
+        part_size = 512 * 1024 ** 2
+    upload_id = client.create_multipart_upload(
+        Bucket=dest_bucket, Key=dest_key,
+        ContentType=head.get('ContentType', 'binary/octet-stream'),
+        Metadata=head.get('Metadata', {})
+    )['UploadId']
+
+    def copy_part(part_number):
+        start = (part_number - 1) * part_size
+        end = min(start + part_size, size) - 1
+        response = client.upload_part_copy(
+            Bucket=dest_bucket, Key=dest_key, UploadId=upload_id, PartNumber=part_number,
+            CopySource={'Bucket': src_bucket, 'Key': src_key}, CopySourceRange=f"bytes={start}-{end}"
+        )
+        return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
+
+    try:
+        parts = list(part_pool.map(copy_part, range(1, -(-size // part_size) + 1)))
+        response = client.complete_multipart_upload(
+            Bucket=dest_bucket, Key=dest_key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+        )
+        return response['ETag']
+    except Exception:
+        client.abort_multipart_upload(Bucket=dest_bucket, Key=dest_key, UploadId=upload_id)
+        raise
+
+@app.command()
+def copy(src_bucket: str, dest_bucket: str, src_prefix: str = "", dest_prefix: str = "",
+         workers: int = 16, report: str = "copy_report.jsonl", dry_run: bool = False):
+    client = get_client("s3", getenv("aws_region_name"), max_workers=workers * 2)
+
+    existing = {obj['Key']: (obj['ETag'], obj['Size']) for obj in list_objects(client, dest_bucket, dest_prefix)}
+    counts = defaultdict(int)
+    lock = threading.Lock()
+
+    def copy_one(obj):
+        src_key = obj['Key']
+        dest_key = dest_prefix + src_key[len(src_prefix):]
+        entry = {'key': src_key, 'dest_key': dest_key, 'size': obj['Size'], 'etag': obj['ETag']}
+        if existing.get(dest_key) == (obj['ETag'], obj['Size']):
+            entry['status'] = 'skipped'
+        elif dry_run:
+            entry['status'] = 'would-copy'
+        else:
+            try:
+                if obj['Size'] > MAX_SINGLE_COPY or '-' in obj['ETag']:
+                    dest_etag = multipart_copy(client, part_pool, src_bucket, src_key, dest_bucket, dest_key, obj['Size'], obj['ETag'])
+                else:
+                    dest_etag = client.copy_object(
+                        Bucket=dest_bucket, Key=dest_key, CopySource={'Bucket': src_bucket, 'Key': src_key}
+                    )['CopyObjectResult']['ETag']
+                entry['status'] = 'copied' if dest_etag == obj['ETag'] else 'mismatch'
+                entry['dest_etag'] = dest_etag
+            except Exception as e:
+                entry['status'] = 'failed'
+                entry['error'] = str(e)
+        with lock:
+            counts[entry['status']] += 1
+            report_file.write(json.dumps(entry) + "\n")
+
+    with open(report, 'w') as report_file, ThreadPoolExecutor(max_workers=workers) as part_pool:
+        run_bounded(copy_one, list_objects(client, src_bucket, src_prefix), workers)
+
+    print('\n'.join(f"{status} - {count}" for status, count in counts.items()))
+    print(f"Verification report written to {report}")
+
 if __name__ == "__main__":
        
     app()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import threading
+from os import getenv
+
+import boto3
+from botocore.config import Config
+
+from task4_bonus.ratelimit import rate_limiter
+
+_lock = threading.Lock()
+_clients = {}
+_local = threading.local()
+client_hooks = []
+
+
+def default_workers():
+    # read on use, so a value loaded from .env by load_dotenv() is honoured
+    return int(getenv("aws_max_workers", "10"))
+
+
+def new_session():
+    return boto3.session.Session(
+        aws_access_key_id=getenv("aws_access_key_id"),
+        aws_secret_access_key=getenv("aws_secret_access_key"),
+        aws_session_token=getenv("aws_session_token"),
+    )
+
+
+def get_session():
+    # sessions are not thread-safe, so each thread keeps its own
+    if not hasattr(_local, "session"):
+        _local.session = new_session()
+    return _local.session
+
+
+def client_config(max_workers=None, max_attempts=10):
+    max_workers = max_workers or default_workers()
+    return Config(
+        max_pool_connections=max(10, max_workers),
+        retries={"mode": "adaptive", "max_attempts": max_attempts},
+    )
+
+
+def get_client(service, region=None, max_workers=None, max_attempts=10):
+    """Return a shared client sized for ``max_workers`` threads.
+
+    Clients are created once per (service, region, pool size, attempts) and
+    are safe to use from several threads.
+    """
+    region = region or getenv("aws_region_name")
+    max_workers = max_workers or default_workers()
+    key = (service, region, max(10, max_workers), max_attempts)
+    with _lock:
+        if key not in _clients:
+            client = get_session().client(
+                service, region_name=region, config=client_config(max_workers, max_attempts)
+            )
+            rate_limiter.attach(client)
+            for hook in client_hooks:
+                hook(client)
+            _clients[key] = client
+        return _clients[key]
+
+
+def all_clients():
+    with _lock:
+        return list(_clients.values())
+
+
+def clear_clients():
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,111 @@
+import time
+import zlib
+
+ENCODINGS = ("gzip", "zstd")
+LEVELS = {"gzip": (1, 3, 6, 9), "zstd": (1, 3, 6, 9, 12, 15, 19)}
+SAMPLE_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+def _zstd():
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd, False
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard, True
+    except ImportError:
+        raise RuntimeError("zstd needs Python 3.14 or the 'zstandard' package") from None
+
+
+def compressor(encoding, level):
+    if encoding == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    if encoding == "zstd":
+        zstd, legacy = _zstd()
+        if legacy:
+            return zstd.ZstdCompressor(level=level).compressobj()
+        return zstd.ZstdCompressor(level=level)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decompressor(encoding):
+    if encoding == "gzip":
+        return zlib.decompressobj(31)
+    if encoding == "zstd":
+        zstd, legacy = _zstd()
+        if legacy:
+            return zstd.ZstdDecompressor().decompressobj()
+        return zstd.ZstdDecompressor()
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def pick_level(fileobj, encoding, target_mbps):
+    """Return the highest level that still compresses a sample of ``fileobj``
+    at ``target_mbps`` MB/s or faster. The file position is restored."""
+    position = fileobj.tell()
+    sample = fileobj.read(SAMPLE_SIZE)
+    fileobj.seek(position)
+    chosen = LEVELS[encoding][0]
+    if not sample:
+        return chosen
+    for level in LEVELS[encoding]:
+        started = time.perf_counter()
+        c = compressor(encoding, level)
+        c.compress(sample)
+        c.flush()
+        mbps = len(sample) / (time.perf_counter() - started) / 1e6
+        if mbps < target_mbps:
+            break
+        chosen = level
+    return chosen
+
+
+class CompressingReader:
+    """Read-only file object that yields ``fileobj`` compressed on the fly.
+
+    Not seekable, so boto3 streams it into a single or multipart upload in
+    chunks without a temporary file.
+    """
+
+    def __init__(self, fileobj, encoding="gzip", level=6):
+        self._fileobj = fileobj
+        self._compressor = compressor(encoding, level)
+        self._buffer = bytearray()
+        self._eof = False
+        self.original_size = 0
+        self.compressed_size = 0
+
+    def read(self, size=-1):
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self._fileobj.read(CHUNK_SIZE)
+            if chunk:
+                self.original_size += len(chunk)
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.compressed_size += len(data)
+        return data
+
+
+def copy_decompressed(body, out, encoding):
+    """Stream ``body`` into ``out``, decoding ``encoding`` if it is one we wrote.
+    Returns the number of bytes written."""
+    d = decompressor(encoding) if encoding in ENCODINGS else None
+    written = 0
+    for chunk in iter(lambda: body.read(CHUNK_SIZE), b""):
+        data = d.decompress(chunk) if d else chunk
+        out.write(data)
+        written += len(data)
+    if d and hasattr(d, "flush"):
+        data = d.flush()
+        out.write(data)
+        written += len(data)
+    return written
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from os import getenv
+
+from botocore.exceptions import ClientError
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ObjectCache:
+    """Read-through disk cache of S3 objects, evicting least recently used first.
+
+    A cached object is revalidated with a conditional GET (If-None-Match), so
+    an unchanged object costs a 304 instead of a download. Entries checked
+    within ``max_age`` seconds are served without any request. The directory
+    and size limit default to S3_OBJECT_CACHE_DIR and S3_OBJECT_CACHE_MAX_BYTES,
+    read when the cache is created so values from .env apply.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_age=0):
+        directory = directory or getenv("S3_OBJECT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "s3-objects"))
+        self.directory = directory
+        self.max_bytes = max_bytes if max_bytes is not None else int(getenv("S3_OBJECT_CACHE_MAX_BYTES", str(1024 ** 3)))
+        self.max_age = max_age
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self.session = {"hits": 0, "revalidated": 0, "misses": 0, "bytes_downloaded": 0, "bytes_saved": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"entries": {}, "totals": {}}
+
+    def _save(self, index):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _count(self, index, **increments):
+        totals = index.setdefault("totals", {})
+        for name, amount in increments.items():
+            self.session[name] += amount
+            totals[name] = totals.get(name, 0) + amount
+
+    def _evict(self, index, keep):
+        entries = index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        for name in sorted(entries, key=lambda name: entries[name]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            entry = entries.pop(name)
+            total -= entry["size"]
+            self._count(index, evictions=1)
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except FileNotFoundError:
+                pass
+
+    def path(self, client, bucket, key):
+        """Return the path of a local copy of s3://bucket/key that is current."""
+        name = f"{bucket}/{key}"
+        file_name = hashlib.sha256(name.encode()).hexdigest()
+        file_path = os.path.join(self.directory, file_name)
+
+        with self._lock:
+            entry = self._load()["entries"].get(name)
+        if entry and not os.path.exists(file_path):
+            entry = None
+
+        if entry and time.time() - entry["checked"] < self.max_age:
+            self._touch(name, entry, hits=1, bytes_saved=entry["size"])
+            return file_path
+
+        try:
+            kwargs = {"IfNoneMatch": entry["etag"]} if entry else {}
+            response = client.get_object(Bucket=bucket, Key=key, **kwargs)
+        except ClientError as e:
+            if entry and e.response["Error"]["Code"] in ("304", "NotModified"):
+                self._touch(name, entry, hits=1, revalidated=1, bytes_saved=entry["size"])
+                return file_path
+            raise
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: response["Body"].read(CHUNK_SIZE), b""):
+                    f.write(chunk)
+            size = os.path.getsize(tmp_path)
+            with self._lock:
+                os.replace(tmp_path, file_path)
+                index = self._load()
+                now = time.time()
+                index["entries"][name] = {"etag": response["ETag"], "size": size, "file": file_name,
+                                          "checked": now, "last_used": now}
+                self._count(index, misses=1, bytes_downloaded=size)
+                self._evict(index, keep=name)
+                self._save(index)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return file_path
+
+    def _touch(self, name, entry, **increments):
+        with self._lock:
+            index = self._load()
+            current = index["entries"].get(name)
+            if current and current["etag"] == entry["etag"]:
+                current["last_used"] = time.time()
+                if increments.get("revalidated"):
+                    current["checked"] = current["last_used"]
+            self._count(index, **increments)
+            self._save(index)
+
+    def read(self, client, bucket, key):
+        with open(self.path(client, bucket, key), "rb") as f:
+            return f.read()
+
+    def stats(self):
+        with self._lock:
+            index = self._load()
+        entries = index["entries"].values()
+        return {
+            "session": dict(self.session),
+            "totals": dict(index.get("totals", {})),
+            "objects": len(entries),
+            "bytes": sum(entry["size"] for entry in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def print_stats(self, file=sys.stderr):
+        stats = self.stats()
+        for label, counts in (("this run", stats["session"]), ("all runs", stats["totals"])):
+            requests = counts.get("hits", 0) + counts.get("misses", 0)
+            ratio = counts.get("hits", 0) / requests if requests else 0
+            print(f"{label:<9} {counts.get('hits', 0)} hit(s) ({counts.get('revalidated', 0)} revalidated), "
+                  f"{counts.get('misses', 0)} miss(es), {ratio:.0%} hit rate, "
+                  f"{counts.get('bytes_saved', 0)} bytes saved, {counts.get('evictions', 0)} eviction(s)", file=file)
+        print(f"cache     {stats['objects']} object(s), {stats['bytes']} of {stats['max_bytes']} bytes", file=file)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._load()["entries"].values():
+                try:
+                    os.remove(os.path.join(self.directory, entry["file"]))
+                except FileNotFoundError:
+                    pass
+            self._save({"entries": {}, "totals": {}})
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from task4_bonus import clients
+from task4_bonus.ratelimit import rate_limiter
+
+THROTTLE_CODES = {"Throttling", "ThrottlingException", "RequestLimitExceeded", "SlowDown", "TooManyRequestsException"}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class CallProfiler:
+    """Records every AWS API call made through botocore event hooks."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.throttles = defaultdict(int)
+        self.clients = []
+        self.origin = time.monotonic()
+
+    def attach(self, client):
+        events = client.meta.events
+        events.register("before-call", self._before_call, unique_id="profiling-before-call")
+        events.register("request-created", self._request_created, unique_id="profiling-request-created")
+        events.register("needs-retry", self._needs_retry, unique_id="profiling-needs-retry")
+        events.register("after-call", self._after_call, unique_id="profiling-after-call")
+        events.register("after-call-error", self._after_call_error, unique_id="profiling-after-call-error")
+        self.clients.append(client)
+
+    def detach(self):
+        for client in self.clients:
+            events = client.meta.events
+            events.unregister("before-call", unique_id="profiling-before-call")
+            events.unregister("request-created", unique_id="profiling-request-created")
+            events.unregister("needs-retry", unique_id="profiling-needs-retry")
+            events.unregister("after-call", unique_id="profiling-after-call")
+            events.unregister("after-call-error", unique_id="profiling-after-call-error")
+        self.clients = []
+
+    def start(self):
+        for client in clients.all_clients():
+            self.attach(client)
+        clients.client_hooks.append(self.attach)
+
+    def stop(self):
+        if self.attach in clients.client_hooks:
+            clients.client_hooks.remove(self.attach)
+        self.detach()
+
+    def _before_call(self, model, context, **kwargs):
+        # after-call-error is emitted without the operation model, so keep its name here
+        context["profile_operation"] = f"{model.service_model.service_name}.{model.name}"
+        context["profile_start"] = time.monotonic()
+        context["profile_bytes_out"] = 0
+
+    def _request_created(self, request, **kwargs):
+        body = request.body
+        if body is not None and hasattr(request, "context"):
+            size = len(body) if isinstance(body, (bytes, str)) else 0
+            request.context["profile_bytes_out"] = request.context.get("profile_bytes_out", 0) + size
+
+    def _needs_retry(self, response, operation, **kwargs):
+        if response is None:
+            return None
+        code = response[1].get("Error", {}).get("Code")
+        if code in THROTTLE_CODES:
+            with self.lock:
+                self.throttles[f"{operation.service_model.service_name}.{operation.name}"] += 1
+        return None
+
+    def _record(self, context, status, retries, bytes_in):
+        started = context.get("profile_start")
+        if started is None:
+            return
+        entry = {
+            "operation": context["profile_operation"],
+            "start": round(started - self.origin, 6),
+            "latency": round(time.monotonic() - started, 6),
+            "status": status,
+            "retries": retries,
+            "bytes_out": context.get("profile_bytes_out", 0),
+            "bytes_in": bytes_in,
+        }
+        with self.lock:
+            self.calls.append(entry)
+
+    def _after_call(self, http_response, parsed, context, **kwargs):
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        bytes_in = int(http_response.headers.get("content-length") or 0)
+        self._record(context, http_response.status_code, retries, bytes_in)
+
+    def _after_call_error(self, exception, context, **kwargs):
+        self._record(context, type(exception).__name__, 0, 0)
+
+    def summary(self):
+        rows = defaultdict(list)
+        with self.lock:
+            calls = list(self.calls)
+            throttles = dict(self.throttles)
+        for call in calls:
+            rows[call["operation"]].append(call)
+
+        summary = []
+        for operation, op_calls in sorted(rows.items()):
+            latencies = [call["latency"] for call in op_calls]
+            summary.append({
+                "operation": operation,
+                "count": len(op_calls),
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p90_ms": percentile(latencies, 90) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "total_s": sum(latencies),
+                "retries": sum(call["retries"] for call in op_calls),
+                "throttles": throttles.get(operation, 0),
+                "errors": sum(1 for call in op_calls if not str(call["status"]).startswith("2")),
+                "bytes": sum(call["bytes_in"] + call["bytes_out"] for call in op_calls),
+            })
+        return summary
+
+    def print_summary(self, file=None):
+        header = f"{'operation':<40}{'count':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'total s':>9}{'retries':>8}{'throttl':>8}{'errors':>7}{'bytes':>12}"
+        print("\n" + header, file=file)
+        for row in self.summary():
+            print(f"{row['operation']:<40}{row['count']:>7}{row['p50_ms']:>9.1f}{row['p90_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                  f"{row['total_s']:>9.2f}{row['retries']:>8}{row['throttles']:>8}{row['errors']:>7}{row['bytes']:>12}", file=file)
+
+    def write_trace(self, path):
+        with self.lock:
+            calls = sorted(self.calls, key=lambda call: call["start"])
+        with open(path, "w") as f:
+            for call in calls:
+                f.write(json.dumps(call) + "\n")
+
+
+@contextmanager
+def profile_calls(enabled=True, trace_path=None):
+    """Profile the AWS calls made inside the block and print a summary at the end.
+
+    Asking for a ``trace_path`` turns profiling on as well.
+    """
+    if not (enabled or trace_path):
+        yield None
+        return
+    profiler = CallProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.print_summary()
+        rate_limiter.print_stats()
+        if trace_path:
+            profiler.write_trace(trace_path)
+            print(f"Call trace written to {trace_path}")
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile-calls", action="store_true", help="Print per-operation AWS API call statistics")
+    parser.add_argument("--call-trace", type=str, help="Write every call as JSON lines to this file (implies --profile-calls)")
@@ -0,0 +1,165 @@
+import logging
+import threading
+from functools import partial
+import time
+from collections import deque
+from os import getenv
+
+THROTTLE_CODES = {"Throttling", "ThrottlingException", "RequestLimitExceeded", "SlowDown", "TooManyRequestsException"}
+
+# (service, family): (calls per second, burst), roughly the default EC2/RDS account budgets
+DEFAULT_BUDGETS = {
+    ("ec2", "describe"): (20, 100),
+    ("ec2", "mutating"): (5, 50),
+    ("ec2", "run_instances"): (2, 5),
+    ("ec2", "terminate_instances"): (5, 100),
+    ("rds", "describe"): (10, 40),
+    ("rds", "mutating"): (3, 20),
+}
+
+
+class TokenBucket:
+    """Token bucket that halves its rate when throttled and creeps back up on success."""
+
+    def __init__(self, rate, burst, window=10):
+        self.max_rate = rate
+        self.min_rate = rate / 16
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.window = window
+        self.updated = time.monotonic()
+        self.last_cut = 0
+        self.throttles = 0
+        self.completed = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        with self.lock:
+            self.throttles += 1
+            now = time.monotonic()
+            # many in-flight calls see the same throttle, so cut at most once a second
+            if now - self.last_cut < 1:
+                return
+            self.last_cut = now
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+        logging.info(f"Throttled, lowering rate to {self.rate:.1f} calls/s")
+
+    def succeeded(self):
+        with self.lock:
+            now = time.monotonic()
+            self.completed.append(now)
+            while self.completed and self.completed[0] < now - self.window:
+                self.completed.popleft()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+    def throughput(self):
+        with self.lock:
+            now = time.monotonic()
+            return sum(1 for stamp in self.completed if stamp >= now - self.window) / self.window
+
+
+def api_family(operation_name):
+    if operation_name == "RunInstances":
+        return "run_instances"
+    if operation_name == "TerminateInstances":
+        return "terminate_instances"
+    if operation_name.startswith(("Describe", "List", "Get", "Search")):
+        return "describe"
+    return "mutating"
+
+
+def parse_budgets(spec):
+    """Parse "ec2.mutating=10/50,rds.describe=20" into budget overrides."""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        service, _, family = name.partition(".")
+        rate, _, burst = value.partition("/")
+        budgets[(service, family)] = (float(rate), float(burst or rate))
+    return budgets
+
+
+class RateLimiter:
+    """Shares one token bucket per (region, service, API family) across every attached client."""
+
+    def __init__(self, budgets=None):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, region, service, operation_name):
+        family = api_family(operation_name)
+        if (service, family) not in self.budgets:
+            return None
+        key = (region, service, family)
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(*self.budgets[(service, family)])
+            return self.buckets[key]
+
+    def attach(self, client):
+        service = client.meta.service_model.service_name
+        if not any(budget_service == service for budget_service, _ in self.budgets):
+            return
+        # API budgets are per account and region, so clients in the same region share them
+        region = client.meta.region_name
+        events = client.meta.events
+        events.register("before-call", partial(self._before_call, region), unique_id="ratelimit-before-call")
+        events.register("needs-retry", partial(self._needs_retry, region), unique_id="ratelimit-needs-retry")
+        events.register("after-call", partial(self._after_call, region), unique_id="ratelimit-after-call")
+
+    def _before_call(self, region, model, **kwargs):
+        bucket = self.bucket(region, model.service_model.service_name, model.name)
+        if bucket:
+            bucket.acquire()
+
+    def _needs_retry(self, region, response, operation, **kwargs):
+        if response is not None and response[1].get("Error", {}).get("Code") in THROTTLE_CODES:
+            bucket = self.bucket(region, operation.service_model.service_name, operation.name)
+            if bucket:
+                bucket.throttled()
+        return None
+
+    def _after_call(self, region, http_response, model, **kwargs):
+        if http_response.status_code < 300:
+            bucket = self.bucket(region, model.service_model.service_name, model.name)
+            if bucket:
+                bucket.succeeded()
+
+    def stats(self):
+        with self.lock:
+            buckets = dict(self.buckets)
+        return {
+            f"{region}/{service}.{family}": {
+                "limit": round(bucket.rate, 2),
+                "throughput": round(bucket.throughput(), 2),
+                "throttles": bucket.throttles,
+            }
+            for (region, service, family), bucket in sorted(buckets.items(), key=lambda item: tuple(map(str, item[0])))
+        }
+
+    def print_stats(self, file=None):
+        stats = self.stats()
+        if not stats:
+            return
+        print(f"\n{'api family':<36}{'limit/s':>9}{'calls/s':>9}{'throttles':>11}", file=file)
+        for family, row in stats.items():
+            print(f"{family:<36}{row['limit']:>9.1f}{row['throughput']:>9.1f}{row['throttles']:>11}", file=file)
+
+
+rate_limiter = RateLimiter(parse_budgets(getenv("aws_rate_limits", "")))
@@ -0,0 +1,34 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import getenv
+
+from task4_bonus.clients import get_client
+
+
+def enabled_regions():
+    ec2 = get_client("ec2", getenv("aws_region_name") or "us-east-1")
+    return sorted(region["RegionName"] for region in ec2.describe_regions(AllRegions=False)["Regions"])
+
+
+def fan_out(fn, regions, max_workers=16):
+    """Call ``fn(region)`` for every region at once.
+
+    Yields (region, result, seconds, error) in the order the regions finish.
+    """
+    def timed(region):
+        started = time.monotonic()
+        try:
+            return region, fn(region), time.monotonic() - started, None
+        except Exception as e:
+            return region, None, time.monotonic() - started, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(timed, region) for region in regions]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def print_region_report(report, file=None):
+    print("\nregion            items   seconds  status", file=file)
+    for region, count, seconds, error in sorted(report, key=lambda row: row[0]):
+        print(f"{region:<18}{count:>5}{seconds:>10.2f}  {error or 'ok'}", file=file)
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+
+def parse_tags(items):
+    tags = {}
+    for item in items or []:
+        key, _, value = item.partition("=")
+        tags[key] = value
+    return tags
+
+
+def tag_list(tags):
+    return [{"Key": key, "Value": value} for key, value in (tags or {}).items()]
+
+
+def tag_specifications(resource_type, tags):
+    if not tags:
+        return []
+    return [{"ResourceType": resource_type, "Tags": tag_list(tags)}]
+
+
+def bulk_tag(ec2_client, tags_by_resource, batch_size=1000, max_workers=4):
+    """Apply {resource_id: {key: value}} with as few create_tags calls as possible.
+
+    Resources that share a tag set are tagged together, ``batch_size`` IDs per
+    call. A batch rejected for an unknown or malformed ID is split until the
+    bad IDs are isolated. Returns the number of tagged resources and a list of
+    errors.
+    """
+    groups = {}
+    for resource_id, tags in tags_by_resource.items():
+        if tags:
+            groups.setdefault(tuple(sorted(tags.items())), []).append(resource_id)
+
+    batches = [
+        (resource_ids[i:i + batch_size], dict(tag_set))
+        for tag_set, resource_ids in groups.items()
+        for i in range(0, len(resource_ids), batch_size)
+    ]
+
+    def tag_batch(batch):
+        resource_ids, tags = batch
+        try:
+            ec2_client.create_tags(Resources=resource_ids, Tags=tag_list(tags))
+            return len(resource_ids), []
+        except ClientError as e:
+            code = e.response["Error"]["Code"]
+            # one bad ID fails the whole call, so halve the batch until it is isolated
+            if len(resource_ids) > 1 and (code == "InvalidID" or code.endswith((".NotFound", ".Malformed"))):
+                half = len(resource_ids) // 2
+                results = [tag_batch((resource_ids[:half], tags)), tag_batch((resource_ids[half:], tags))]
+                return sum(count for count, _ in results), [error for _, errors in results for error in errors]
+            return 0, [f"{len(resource_ids)} resources starting at {resource_ids[0]}: {e}"]
+
+    tagged = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for count, batch_errors in pool.map(tag_batch, batches):
+            tagged += count
+            errors.extend(batch_errors)
+    return tagged, errors
@@ -1,14 +1,20 @@
 import typer
 import argparse
-import boto3
 import magic
 import io
 import logging
 from botocore.exceptions import ClientError
 from os import getenv
 from dotenv import load_dotenv
+from task4_bonus.clients import get_client
 import json
+import os
+import queue
+import threading
+import time
 from boto3.s3.transfer import TransferConfig
+from task4_bonus.compress import ENCODINGS, CompressingReader, copy_decompressed, pick_level
+from task4_bonus.inotify import IN_CREATE, IN_ISDIR, IN_MOVED_TO, Inotify
 
 load_dotenv()
 
@@ -17,14 +23,10 @@ app = typer.Typer()
 def init_client():
 
     try:
-        client = boto3.client("s3",
-                aws_access_key_id=getenv("aws_access_key_id"),
-                aws_secret_access_key=getenv("aws_secret_access_key"),
-                aws_session_token=getenv("aws_session_token"),
-                region_name=getenv("aws_region_name")
-                )
+        client = get_client("s3", getenv("aws_region_name"))
     
-        client.list_buckets()
+        # probe without retries, so a missing network fails fast
+        get_client("s3", getenv("aws_region_name"), max_attempts=1).list_buckets()
 
         return client
     
@@ -37,17 +39,35 @@ aws_client = init_client()
 
 
 
+def upload_compressed(file_path, bucket_name, key, encoding, target_mbps, extra_args=None, config=None):
+    if encoding not in ENCODINGS:
+        raise typer.BadParameter(f"choose one of {', '.join(ENCODINGS)}", param_hint="--compress")
+
+    with open(file_path, 'rb') as f:
+        level = pick_level(f, encoding, target_mbps)
+        reader = CompressingReader(f, encoding, level)
+        extra_args = dict(extra_args or {})
+        extra_args['ContentEncoding'] = encoding
+        extra_args['Metadata'] = {'original-size': str(os.path.getsize(file_path))}
+        aws_client.upload_fileobj(reader, bucket_name, key, ExtraArgs=extra_args, Config=config)
+
+    saved = 1 - reader.compressed_size / reader.original_size if reader.original_size else 0
+    print(f"{encoding} level {level}: {reader.original_size} -> {reader.compressed_size} bytes ({saved:.0%} smaller)")
+
 @app.command()
-def upload_small_files(src:str, bucket_name:str, dest:str):
+def upload_small_files(src:str, bucket_name:str, dest:str, compress: str = None, target_mbps: float = 50):
     try:
-        response = aws_client.upload_file(src, bucket_name, dest)
+        if compress:
+            upload_compressed(src, bucket_name, dest, compress, target_mbps)
+        else:
+            response = aws_client.upload_file(src, bucket_name, dest)
         print("small file uploaded successfully")
 
     except ClientError as e:
         print("unfortunatelly,small file was not uploaded successfully")
 
 @app.command()
-def multipart_upload_boto3(file_path, bucket_name, key):
+def multipart_upload_boto3(file_path, bucket_name, key, compress: str = None, target_mbps: float = 50):
 
     config = TransferConfig(
         multipart_threshold=8 * 1024 * 1024,  
@@ -57,13 +77,17 @@ def multipart_upload_boto3(file_path, bucket_name, key):
     )
 
     try:
-        aws_client.upload_file(
-            file_path,
-            bucket_name,
-            key,
-            ExtraArgs={'ContentType': 'application/*'},
-            Config=config
-        )
+        if compress:
+            upload_compressed(file_path, bucket_name, key, compress, target_mbps,
+                              extra_args={'ContentType': 'application/*'}, config=config)
+        else:
+            aws_client.upload_file(
+                file_path,
+                bucket_name,
+                key,
+                ExtraArgs={'ContentType': 'application/*'},
+                Config=config
+            )
 
         print("Uploaded")
 
@@ -72,6 +96,173 @@ def multipart_upload_boto3(file_path, bucket_name, key):
         print("Not uploaded")
 
 
+@app.command()
+def download_file(bucket_name: str, key: str, dest: str):
+    """Download KEY to DEST, undoing gzip/zstd Content-Encoding set by --compress uploads."""
+    try:
+        response = aws_client.get_object(Bucket=bucket_name, Key=key)
+        encoding = response.get('ContentEncoding')
+        with open(dest, 'wb') as out:
+            written = copy_decompressed(response['Body'], out, encoding)
+    except ClientError as e:
+        logging.error(e)
+        print("Not downloaded")
+        return
+
+    expected = response.get('Metadata', {}).get('original-size')
+    if expected and int(expected) != written:
+        print(f"Warning: wrote {written} bytes but the upload recorded {expected}")
+    print(f"Downloaded {key} to {dest} ({written} bytes{', decoded ' + encoding if encoding in ENCODINGS else ''})")
+
+
+def load_watch_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_watch_state(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+@app.command()
+def watch(src_dir: str, bucket_name: str, dest_prefix: str = "", debounce: float = 2.0, workers: int = 8,
+          queue_size: int = 256, state_file: str = None, compress: str = None, target_mbps: float = 50):
+    """Upload files under SRC_DIR as soon as they stop changing.
+
+    Uploaded files are remembered by size and mtime in STATE_FILE, so a restart
+    only uploads what is new or changed since. Linux only (inotify).
+    """
+    state_file = os.path.abspath(state_file or os.path.join(src_dir, ".s3-watch-state.json"))
+    ignored = {state_file, state_file + ".tmp"}
+    state = load_watch_state(state_file)
+    lock = threading.Lock()
+    dirty = threading.Event()
+    in_flight = set()
+    # bounded, so a slow upload side blocks the event loop instead of growing memory
+    jobs = queue.Queue(maxsize=queue_size)
+
+    def upload(path):
+        rel = os.path.relpath(path, src_dir)
+        key = dest_prefix + rel.replace(os.sep, "/")
+        signature = file_signature(path)
+        if compress:
+            upload_compressed(path, bucket_name, key, compress, target_mbps)
+        else:
+            aws_client.upload_file(path, bucket_name, key)
+        with lock:
+            state[rel] = signature
+        dirty.set()
+        print(f"Uploaded {rel} -> s3://{bucket_name}/{key}")
+
+    def worker():
+        while True:
+            path = jobs.get()
+            if path is None:
+                return
+            try:
+                upload(path)
+            except Exception as e:
+                # left out of the state, so the next rescan or restart retries it;
+                # the worker itself must survive, or the queue stops draining
+                logging.error(f"Failed to upload {path}: {e}")
+            finally:
+                with lock:
+                    in_flight.discard(path)
+
+    def enqueue(item):
+        # never block on a queue that no worker is left to drain
+        while True:
+            try:
+                jobs.put(item, timeout=1)
+                return True
+            except queue.Full:
+                if not any(thread.is_alive() for thread in threads):
+                    return False
+
+    def needs_upload(path):
+        rel = os.path.relpath(path, src_dir)
+        with lock:
+            return state.get(rel) != file_signature(path)
+
+    pending = {}
+
+    def rescan():
+        for dirpath, _, names in os.walk(src_dir):
+            for name in names:
+                pending.setdefault(os.path.join(dirpath, name), time.monotonic() + debounce)
+
+    notifier = Inotify()
+    notifier.add_tree(src_dir)
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    # catch up on whatever arrived while we were not running
+    rescan()
+    print(f"Watching {src_dir} -> s3://{bucket_name}/{dest_prefix}")
+    try:
+        while True:
+            timeout = max(0, min(pending.values()) - time.monotonic()) if pending else 1.0
+            for path, mask in notifier.read(min(timeout, 1.0)):
+                if path is None:
+                    rescan()
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        notifier.add_tree(path)
+                        rescan()
+                elif os.path.abspath(path) not in ignored:
+                    # every write pushes the deadline back, so half-written files wait
+                    pending[path] = time.monotonic() + debounce
+
+            now = time.monotonic()
+            for path, deadline in list(pending.items()):
+                if deadline > now:
+                    continue
+                del pending[path]
+                if os.path.abspath(path) in ignored:
+                    continue
+                with lock:
+                    busy = path in in_flight
+                if busy:
+                    pending[path] = now + debounce
+                    continue
+                try:
+                    if not os.path.isfile(path) or not needs_upload(path):
+                        continue
+                except FileNotFoundError:
+                    continue
+                with lock:
+                    in_flight.add(path)
+                if not enqueue(path):
+                    raise RuntimeError("All upload workers have stopped")
+
+            if dirty.is_set():
+                dirty.clear()
+                with lock:
+                    snapshot = dict(state)
+                save_watch_state(state_file, snapshot)
+    except KeyboardInterrupt:
+        print("Stopping, waiting for uploads in progress...")
+    finally:
+        for _ in threads:
+            if not enqueue(None):
+                break
+        for thread in threads:
+            thread.join()
+        with lock:
+            snapshot = dict(state)
+        save_watch_state(state_file, snapshot)
+        notifier.close()
+
+
 @app.command()
 def put_policy(bucket_name:str):
     lfc = {
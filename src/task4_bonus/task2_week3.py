@@ -1,12 +1,12 @@
 import typer
 import argparse
-import boto3
 import magic
 import io
 import logging
 from botocore.exceptions import ClientError
 from os import getenv
 from dotenv import load_dotenv
+from task4_bonus.clients import get_client
 import json
 
 load_dotenv()
@@ -16,14 +16,10 @@ app = typer.Typer()
 def init_client():
 
     try:
-        client = boto3.client("s3",
-                aws_access_key_id=getenv("aws_access_key_id"),
-                aws_secret_access_key=getenv("aws_secret_access_key"),
-                aws_session_token=getenv("aws_session_token"),
-                region_name=getenv("aws_region_name")
-                )
+        client = get_client("s3", getenv("aws_region_name"))
     
-        client.list_buckets()
+        # probe without retries, so a missing network fails fast
+        get_client("s3", getenv("aws_region_name"), max_attempts=1).list_buckets()
 
         return client
     
@@ -1,13 +1,23 @@
 import typer
 import argparse
-import boto3
 import magic
 import io
 import logging
 from botocore.exceptions import ClientError
 from os import getenv
 from dotenv import load_dotenv
+from task4_bonus.clients import get_client
 import json
+import os
+import shutil
+import sys
+import heapq
+import threading
+from datetime import datetime, timezone
+from task4_bonus.object_cache import ObjectCache
+from task4_bonus.workers import run_bounded
+
+MAX_SINGLE_COPY = 5 * 1024 ** 3
 
 load_dotenv()
 
@@ -16,14 +26,10 @@ app = typer.Typer()
 def init_client():
 
     try:
-        client = boto3.client("s3",
-                aws_access_key_id=getenv("aws_access_key_id"),
-                aws_secret_access_key=getenv("aws_secret_access_key"),
-                aws_session_token=getenv("aws_session_token"),
-                region_name=getenv("aws_region_name")
-                )
+        client = get_client("s3", getenv("aws_region_name"))
     
-        client.list_buckets()
+        # probe without retries, so a missing network fails fast
+        get_client("s3", getenv("aws_region_name"), max_attempts=1).list_buckets()
 
         return client
     
@@ -78,6 +84,127 @@ def upload_previous_version_as_new(bucket_name, file_name, flag: str = "upload-p
 
 
 
+def iter_versions(client, bucket_name, prefix):
+    """Yield every version and delete marker under PREFIX, per key newest first."""
+    paginator = client.get_paginator("list_object_versions")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        versions = [dict(version, IsDeleteMarker=False) for version in page.get("Versions", [])]
+        markers = [dict(marker, IsDeleteMarker=True) for marker in page.get("DeleteMarkers", [])]
+        # Both lists already come in S3's order, so merge them without reordering
+        # either one. LastModified only has one-second resolution: when a version
+        # and a delete marker share a second, the one S3 flags IsLatest is newer.
+        yield from heapq.merge(versions, markers, key=lambda entry: (
+            entry["Key"], -entry["LastModified"].timestamp(), not entry["IsLatest"]))
+
+def plan_restore(entries, at):
+    """Yield (action, key, target) per key for restoring to time AT, in one pass.
+
+    action is "restore" (copy the target version over the key), "delete" (the
+    key did not exist at AT) or "unchanged". A key whose current version has
+    the target's content (same ETag), such as one restored earlier, is unchanged.
+    """
+    key = latest = target = None
+
+    def decide():
+        if latest is None:
+            return "unchanged", key, target
+        if target is None or target["IsDeleteMarker"]:
+            return ("unchanged" if latest["IsDeleteMarker"] else "delete"), key, target
+        if not latest["IsDeleteMarker"] and latest["ETag"] == target["ETag"]:
+            return "unchanged", key, target
+        return "restore", key, target
+
+    for entry in entries:
+        if entry["Key"] != key:
+            if key is not None:
+                yield decide()
+            key, latest, target = entry["Key"], None, None
+        if entry["IsLatest"]:
+            latest = entry
+        if target is None and entry["LastModified"] <= at:
+            target = entry
+    if key is not None:
+        yield decide()
+
+@app.command()
+def restore_prefix(bucket_name: str, prefix: str, timestamp: str, apply: bool = False, keep_new: bool = False,
+                   workers: int = 16):
+    """Restore every key under PREFIX to its state at TIMESTAMP (ISO 8601, UTC if no offset).
+
+    Prints the diff only, unless --apply is given. Restores are server-side
+    copies of the old version, so the current versions stay in history.
+    """
+    at = datetime.fromisoformat(timestamp)
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+
+    client = get_client("s3", getenv("aws_region_name"), max_workers=workers)
+    lock = threading.Lock()
+    counts = {}
+
+    def run(item):
+        action, key, target = item
+        if action == "delete" and keep_new:
+            action = "kept"
+        if action in ("restore", "delete"):
+            detail = f"{target['VersionId']} ({target['LastModified']:%Y-%m-%d %H:%M:%S})" if action == "restore" else "did not exist"
+            if apply:
+                try:
+                    if action == "delete":
+                        # adds a delete marker, so this can be undone too
+                        client.delete_object(Bucket=bucket_name, Key=key)
+                    else:
+                        source = {"Bucket": bucket_name, "Key": key, "VersionId": target["VersionId"]}
+                        if target["Size"] > MAX_SINGLE_COPY:
+                            client.copy(source, bucket_name, key)
+                        else:
+                            client.copy_object(Bucket=bucket_name, Key=key, CopySource=source)
+                except ClientError as e:
+                    action, detail = "failed", str(e)
+            typer.echo(f"{action:<8} {key}  {detail}")
+        with lock:
+            counts[action] = counts.get(action, 0) + 1
+
+    run_bounded(run, plan_restore(iter_versions(client, bucket_name, prefix), at), workers)
+
+    summary = ", ".join(f"{count} {action}" for action, count in sorted(counts.items())) or "no keys"
+    typer.echo(f"{'Applied' if apply else 'Dry run'}: {summary}")
+    if not apply and (counts.get("restore") or counts.get("delete")):
+        typer.echo("Run again with --apply to make these changes.")
+
+@app.command()
+def get(bucket_name: str, key: str, dest: str = None, max_age: int = 0, stats: bool = False):
+    """Copy s3://BUCKET/KEY to DEST through the local object cache."""
+    name = os.path.basename(key)
+    if not dest or os.path.isdir(dest):
+        if not name:
+            raise typer.BadParameter(f"'{key}' has no file name, pass --dest", param_hint="--dest")
+        dest = os.path.join(dest or "", name)
+    cache = ObjectCache(max_age=max_age)
+    shutil.copyfile(cache.path(aws_client, bucket_name, key), dest)
+    typer.echo(f"Saved {key} to {dest}")
+    if stats:
+        cache.print_stats()
+
+@app.command()
+def cat(bucket_name: str, key: str, max_age: int = 0, stats: bool = False):
+    """Write s3://BUCKET/KEY to stdout through the local object cache."""
+    cache = ObjectCache(max_age=max_age)
+    with open(cache.path(aws_client, bucket_name, key), "rb") as f:
+        shutil.copyfileobj(f, sys.stdout.buffer)
+    sys.stdout.flush()
+    if stats:
+        cache.print_stats()
+
+@app.command()
+def cache_stats(clear: bool = False):
+    cache = ObjectCache()
+    cache.print_stats(file=sys.stdout)
+    if clear:
+        cache.clear()
+        typer.echo("Cache cleared.")
+
+
 if __name__ == "__main__":
        
     app()
\ No newline at end of file
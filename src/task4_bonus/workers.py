@@ -0,0 +1,33 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_bounded(fn, items, workers, backlog=None):
+    """Call ``fn(item)`` for every item on ``workers`` threads.
+
+    Unlike ``Executor.map`` the items are pulled lazily: at most ``backlog``
+    (default 4 * workers) of them are queued at once, so a listing of millions
+    of keys is never held in memory. Exceptions raised by ``fn`` propagate
+    once every submitted item has finished.
+    """
+    slots = threading.BoundedSemaphore(backlog or workers * 4)
+    errors = []
+
+    def task(item):
+        try:
+            fn(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for item in items:
+            slots.acquire()
+            if errors:
+                slots.release()
+                break
+            pool.submit(task, item)
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,86 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def _timed(fn, inputs):
+    started = time.monotonic()
+    result = fn(inputs)
+    return result, started, time.monotonic()
+
+
+def run_graph(steps, max_workers=8, done=None, on_complete=None):
+    """Run ``steps`` ({name: (deps, fn)}) as soon as their deps have results.
+
+    ``fn`` receives a dict with the results of its deps. Steps already present
+    in ``done`` are not run again. Returns (results, timings) where timings maps
+    step name to (start offset, duration) in seconds.
+    """
+    results = dict(done or {})
+    timings = {}
+    pending = {name: deps for name, (deps, _) in steps.items() if name not in results}
+    running = {}
+    failure = None
+    origin = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            if failure is None:
+                for name, deps in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        inputs = {dep: results[dep] for dep in deps}
+                        running[pool.submit(_timed, steps[name][1], inputs)] = name
+                        del pending[name]
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    result, started, ended = future.result()
+                except Exception as e:
+                    logging.error(f"Step '{name}' failed: {e}")
+                    if failure is None:
+                        failure = e
+                    continue
+                results[name] = result
+                timings[name] = (started - origin, ended - started)
+                logging.info(f"Step '{name}' finished in {ended - started:.1f}s")
+                if on_complete:
+                    on_complete(name, result)
+
+    if failure is not None:
+        raise failure
+    if pending:
+        raise ValueError(f"Unresolvable step dependencies: {sorted(pending)}")
+    return results, timings
+
+
+def critical_path(steps, timings):
+    """Return the chain of steps that ended last, following the latest-ending dependency."""
+    ends = {name: start + duration for name, (start, duration) in timings.items()}
+    if not ends:
+        return []
+    name = max(ends, key=ends.get)
+    path = [name]
+    while True:
+        deps = [dep for dep in steps[name][0] if dep in ends]
+        if not deps:
+            break
+        name = max(deps, key=ends.get)
+        path.append(name)
+    return list(reversed(path))
+
+
+def log_timings(timings, steps=None):
+    if not timings:
+        return
+    total = max(start + duration for start, duration in timings.values())
+    busy = sum(duration for _, duration in timings.values())
+    logging.info(f"{'step':<24}{'start':>8}{'took':>8}")
+    for name, (start, duration) in sorted(timings.items(), key=lambda item: item[1][0]):
+        logging.info(f"{name:<24}{start:>7.1f}s{duration:>7.1f}s")
+    logging.info(f"Wall time {total:.1f}s, sequential time {busy:.1f}s")
+    if steps:
+        logging.info(f"Critical path: {' -> '.join(critical_path(steps, timings))}")
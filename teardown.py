@@ -0,0 +1,158 @@
+import logging
+import time
+from botocore.exceptions import ClientError, WaiterError
+from stack_graph import run_graph
+
+RETRYABLE_CODES = {
+    'DependencyViolation',
+    'InvalidGroup.InUse',
+    'InvalidDBInstanceState',
+    'InvalidDBSubnetGroupStateFault',
+    'RequestLimitExceeded',
+    'Throttling',
+    'ThrottlingException',
+}
+
+NOT_FOUND_CODES = {
+    'InvalidInstanceID.NotFound',
+    'InvalidGroup.NotFound',
+    'InvalidSubnetID.NotFound',
+    'InvalidRouteTableID.NotFound',
+    'InvalidInternetGatewayID.NotFound',
+    'InvalidVpcID.NotFound',
+    'Gateway.NotAttached',
+    'DBInstanceNotFound',
+    'DBInstanceNotFoundFault',
+    'DBSubnetGroupNotFoundFault',
+    'InvalidKeyPair.NotFound',
+}
+
+# A resource type is only deleted once every resource of the listed types is gone.
+# The RDS group allows MySQL from the EC2 group, so it has to go first.
+DELETE_AFTER = {
+    'instance': [],
+    'db_instance': [],
+    'rds_sg': ['db_instance'],
+    'key_pair': ['instance'],
+    'sg': ['instance', 'db_instance', 'rds_sg'],
+    'rds_subnet_group': ['db_instance'],
+    'igw': ['instance'],
+    'subnet': ['instance', 'db_instance', 'rds_subnet_group'],
+    'rtb': ['subnet'],
+    'vpc': ['sg', 'rds_sg', 'igw', 'subnet', 'rtb'],
+}
+
+
+def with_retries(fn, attempts=8, delay=2, max_delay=30):
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in NOT_FOUND_CODES:
+                return None
+            if code not in RETRYABLE_CODES or attempt == attempts - 1:
+                raise
+            wait_for = min(delay * 2 ** attempt, max_delay)
+            logging.info(f"{code}, retrying in {wait_for}s")
+            time.sleep(wait_for)
+
+
+def delete_resource(ec2, rds, r_type, r_id):
+    """Delete one resource. Returns False if it was still not gone when the waiter gave up."""
+    if r_type == 'instance':
+        # None means NotFound: the instance is long gone and the waiter would never see it
+        if with_retries(lambda: ec2.terminate_instances(InstanceIds=[r_id])) is None:
+            logging.info(f"EC2 instance {r_id} no longer exists")
+            return True
+        try:
+            ec2.get_waiter('instance_terminated').wait(InstanceIds=[r_id], WaiterConfig={'Delay': 5, 'MaxAttempts': 120})
+        except WaiterError as e:
+            if (e.last_response or {}).get('Error', {}).get('Code') in NOT_FOUND_CODES:
+                logging.info(f"EC2 instance {r_id} no longer exists")
+                return True
+            logging.error(f"EC2 instance {r_id} did not terminate: {e}")
+            return False
+        logging.info(f"Terminated EC2 instance: {r_id}")
+    elif r_type == 'db_instance':
+        with_retries(lambda: rds.delete_db_instance(DBInstanceIdentifier=r_id, SkipFinalSnapshot=True))
+        try:
+            rds.get_waiter('db_instance_deleted').wait(DBInstanceIdentifier=r_id, WaiterConfig={'Delay': 15, 'MaxAttempts': 120})
+        except ClientError as e:
+            if e.response['Error']['Code'] not in NOT_FOUND_CODES:
+                raise
+        except WaiterError as e:
+            logging.error(f"RDS instance {r_id} was not deleted: {e}")
+            return False
+        logging.info(f"Deleted RDS Instance: {r_id}")
+    elif r_type in ('sg', 'rds_sg'):
+        with_retries(lambda: ec2.delete_security_group(GroupId=r_id))
+        logging.info(f"Deleted Security Group: {r_id}")
+    elif r_type == 'subnet':
+        with_retries(lambda: ec2.delete_subnet(SubnetId=r_id))
+        logging.info(f"Deleted Subnet: {r_id}")
+    elif r_type == 'rtb':
+        # leftover subnet associations would otherwise block the delete
+        tables = with_retries(lambda: ec2.describe_route_tables(RouteTableIds=[r_id]))
+        for table in (tables or {}).get('RouteTables', []):
+            for association in table.get('Associations', []):
+                if not association.get('Main'):
+                    with_retries(lambda: ec2.disassociate_route_table(AssociationId=association['RouteTableAssociationId']))
+        with_retries(lambda: ec2.delete_route_table(RouteTableId=r_id))
+        logging.info(f"Deleted Route Table: {r_id}")
+    elif r_type == 'igw':
+        igw_id, vpc_id = r_id
+        with_retries(lambda: ec2.detach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id))
+        with_retries(lambda: ec2.delete_internet_gateway(InternetGatewayId=igw_id))
+        logging.info(f"Deleted IGW: {igw_id}")
+    elif r_type == 'vpc':
+        with_retries(lambda: ec2.delete_vpc(VpcId=r_id))
+        logging.info(f"Deleted VPC: {r_id}")
+    elif r_type == 'key_pair':
+        with_retries(lambda: ec2.delete_key_pair(KeyName=r_id))
+        logging.info(f"Deleted Key Pair: {r_id}")
+    elif r_type == 'rds_subnet_group':
+        with_retries(lambda: rds.delete_db_subnet_group(DBSubnetGroupName=r_id))
+        logging.info(f"Deleted RDS Subnet Group: {r_id}")
+    else:
+        raise ValueError(f"Unknown resource type: {r_type}")
+    return True
+
+
+def _step_name(r_type, r_id):
+    if r_type == 'igw':
+        r_id = r_id[0]
+    return f"{r_type}:{r_id}"
+
+
+def teardown(ec2, rds, resources, max_workers=8):
+    """Delete ``resources`` ([(type, id)]) concurrently in dependency order.
+
+    Returns the resources that could not be deleted.
+    """
+    resources = list(dict.fromkeys((r_type, tuple(r_id) if isinstance(r_id, list) else r_id)
+                                   for r_type, r_id in resources))
+    names = {_step_name(r_type, r_id): (r_type, r_id) for r_type, r_id in resources}
+
+    def step(r_type, r_id):
+        def run(inputs):
+            blocked = [name for name, deleted in inputs.items() if not deleted]
+            if blocked:
+                logging.warning(f"Skipping {r_type} {r_id}, still waiting on {blocked}")
+                return False
+            try:
+                return delete_resource(ec2, rds, r_type, r_id)
+            except Exception as e:
+                logging.error(f"Failed to delete {r_type} {r_id}: {e}")
+                return False
+        return run
+
+    steps = {}
+    for name, (r_type, r_id) in names.items():
+        after = DELETE_AFTER.get(r_type, [])
+        deps = [other for other, (o_type, _) in names.items() if o_type in after]
+        steps[name] = (deps, step(r_type, r_id))
+
+    results, _ = run_graph(steps, max_workers=max_workers)
+    remaining = [names[name] for name, deleted in results.items() if not deleted]
+    return remaining
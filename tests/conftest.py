@@ -0,0 +1,34 @@
+import importlib
+
+import pytest
+from moto import mock_aws
+
+import lookup_cache
+from task4_bonus import clients
+
+
+@pytest.fixture
+def aws(monkeypatch, tmp_path):
+    """Run the test against moto, with fresh shared clients and an empty lookup cache."""
+    for name in ("aws_access_key_id", "aws_secret_access_key", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("aws_region_name", "us-east-1")
+    monkeypatch.setattr(lookup_cache, "CACHE_PATH", str(tmp_path / "lookups.json"))
+    with mock_aws():
+        # clients made outside the mock would talk to the real endpoints
+        clients.clear_clients()
+        yield
+    clients.clear_clients()
+
+
+@pytest.fixture
+def task3(aws):
+    """task4_bonus.task3_week3 with its module-level S3 client pointed at moto."""
+    module = importlib.import_module("task4_bonus.task3_week3")
+    module.aws_client = clients.get_client("s3")
+    return module
+
+
+@pytest.fixture
+def ec2(aws):
+    return clients.get_client("ec2", "us-east-1")
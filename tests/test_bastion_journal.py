@@ -0,0 +1,105 @@
+import argparse
+
+import pytest
+
+import lookup_cache
+from journal import Journal
+from task4_bonus import clients
+
+
+@pytest.fixture
+def bastion(aws, tmp_path):
+    lookup_cache.put("public_ip", "203.0.113.10", 3600)
+    import Lecture11_task1
+    return Lecture11_task1, argparse.Namespace(
+        vpc_cidr="10.0.0.0/16", region="us-east-1", key_name="test-key", key_dir=str(tmp_path),
+        instance_name="test-ec2", workers=4, journal=str(tmp_path / "journal.jsonl"), keep_on_failure=True,
+    )
+
+
+def test_resume_does_not_recreate_half_finished_step(bastion, monkeypatch):
+    module, args = bastion
+    add_route = module.add_route_to_igw
+
+    def fail(*a, **kw):
+        raise RuntimeError("route failed")
+
+    monkeypatch.setattr(module, "add_route_to_igw", fail)
+    assert module.create_bastion(args) is None
+
+    monkeypatch.setattr(module, "add_route_to_igw", add_route)
+    assert module.create_bastion(args)
+
+    ec2 = clients.get_client("ec2", "us-east-1")
+    vpc_id = ec2.describe_vpcs(Filters=[{"Name": "cidr", "Values": ["10.0.0.0/16"]}])["Vpcs"][0]["VpcId"]
+    tables = ec2.describe_route_tables(Filters=[{"Name": "vpc-id", "Values": [vpc_id]}])["RouteTables"]
+    # main table, one per private subnet, one public
+    assert len(tables) == 4
+
+
+def test_partial_rollback_keeps_steps_whose_resources_survive(tmp_path):
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.resource("vpc", "vpc-1", "vpc:create")
+    journal.step("vpc:create", "vpc-1")
+    journal.step("vpc", "vpc-1")
+    journal.resource("subnet", "subnet-1", "public_subnet:subnet")
+    journal.step("public_subnet:subnet", "subnet-1")
+    journal.resource("rtb", "rtb-1", "public_rtb:rtb")
+    journal.step("public_rtb:rtb", "rtb-1")
+    journal.step("public_rtb:associate", "rtbassoc-1")
+    journal.step("public_rtb", "rtb-1")
+    journal.step("key_pair", "test-key")
+
+    journal.rollback([("rtb", "rtb-1")])
+    done, resources = journal.load()
+
+    assert sorted(done) == ["key_pair", "public_subnet:subnet", "vpc", "vpc:create"]
+    assert resources == [("vpc", "vpc-1"), ("subnet", "subnet-1")]
+
+
+def test_rollback_deletes_the_whole_stack(bastion):
+    module, args = bastion
+    assert module.create_bastion(args)
+    _, resources = Journal(args.journal).load()
+    assert ("rds_sg", dict(resources)["rds_sg"]) in resources
+    ec2 = clients.get_client("ec2", args.region)
+    # named at creation, with no separate create_tags call
+    vpc = ec2.describe_vpcs(VpcIds=[dict(resources)["vpc"]])["Vpcs"][0]
+    assert {"Key": "Name", "Value": "bastion-vpc"} in vpc["Tags"]
+
+    assert module.rollback(resources, args.region, args.workers) == []
+    assert not ec2.describe_key_pairs()["KeyPairs"]
+
+
+def test_stuck_instance_does_not_abort_the_rollback(bastion, monkeypatch):
+    from botocore.exceptions import WaiterError
+
+    module, args = bastion
+    assert module.create_bastion(args)
+    _, resources = Journal(args.journal).load()
+
+    class StuckWaiter:
+        def wait(self, **kwargs):
+            raise WaiterError("InstanceTerminated", "Max attempts exceeded", {})
+
+    ec2 = clients.get_client("ec2", args.region, args.workers)
+    get_waiter = ec2.get_waiter
+    monkeypatch.setattr(ec2, "get_waiter", lambda name: StuckWaiter() if name == "instance_terminated" else get_waiter(name))
+
+    remaining = dict(module.rollback(resources, args.region, args.workers))
+    assert sorted(remaining) == ["igw", "instance", "key_pair", "rtb", "sg", "subnet", "vpc"]
+    assert "db_instance" not in remaining and "rds_sg" not in remaining
+
+
+def test_instance_that_no_longer_exists_counts_as_deleted(bastion):
+    from teardown import teardown
+
+    ec2 = clients.get_client("ec2", "us-east-1")
+    rds = clients.get_client("rds", "us-east-1")
+    vpc_id = ec2.create_vpc(CidrBlock="10.30.0.0/16")["Vpc"]["VpcId"]
+    sg_id = ec2.create_security_group(GroupName="gone-test", Description="test", VpcId=vpc_id)["GroupId"]
+
+    remaining = teardown(ec2, rds, [("vpc", vpc_id), ("sg", sg_id), ("instance", "i-0123456789abcdef0")])
+
+    assert remaining == []
+    assert not ec2.describe_vpcs(Filters=[{"Name": "vpc-id", "Values": [vpc_id]}])["Vpcs"]
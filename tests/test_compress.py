@@ -0,0 +1,68 @@
+import io
+import os
+
+import pytest
+
+from task4_bonus import compress
+from task4_bonus.compress import CompressingReader, copy_decompressed, pick_level
+
+
+def zstd_available():
+    try:
+        compress._zstd()
+        return True
+    except RuntimeError:
+        return False
+
+
+ENCODINGS = [
+    "gzip",
+    pytest.param("zstd", marks=pytest.mark.skipif(not zstd_available(), reason="no zstd module")),
+]
+
+
+@pytest.fixture
+def payload():
+    # spans several CHUNK_SIZE reads and mixes compressible and random bytes
+    return (b"0123456789abcdef" * 65536 + os.urandom(65536)) * 3
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_round_trip(payload, encoding):
+    reader = CompressingReader(io.BytesIO(payload), encoding, level=3)
+    compressed = b"".join(iter(lambda: reader.read(100_000), b""))
+
+    assert reader.original_size == len(payload)
+    assert reader.compressed_size == len(compressed) < len(payload)
+
+    out = io.BytesIO()
+    assert copy_decompressed(io.BytesIO(compressed), out, encoding) == len(payload)
+    assert out.getvalue() == payload
+
+
+def test_read_all_at_once_matches_chunked_reads(payload):
+    whole = CompressingReader(io.BytesIO(payload)).read()
+    out = io.BytesIO()
+    copy_decompressed(io.BytesIO(whole), out, "gzip")
+    assert out.getvalue() == payload
+
+
+def test_unknown_encoding_is_copied_as_is():
+    out = io.BytesIO()
+    assert copy_decompressed(io.BytesIO(b"plain bytes"), out, "br") == 11
+    assert out.getvalue() == b"plain bytes"
+
+
+def test_pick_level_restores_the_file_position(payload):
+    fileobj = io.BytesIO(payload)
+    fileobj.seek(10)
+    pick_level(fileobj, "gzip", 1)
+    assert fileobj.tell() == 10
+
+
+def test_pick_level_bounds():
+    data = io.BytesIO(b"abc" * 100_000)
+    # an unreachable target keeps the fastest level, no target allows the slowest
+    assert pick_level(data, "gzip", 1e12) == compress.LEVELS["gzip"][0]
+    assert pick_level(data, "gzip", 0) == compress.LEVELS["gzip"][-1]
+    assert pick_level(io.BytesIO(), "gzip", 0) == compress.LEVELS["gzip"][0]
@@ -0,0 +1,36 @@
+import pytest
+from typer.testing import CliRunner
+
+from task4_bonus.object_cache import ObjectCache
+
+BUCKET = "object-cache-test"
+
+
+@pytest.fixture
+def task3(task3, monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_OBJECT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.chdir(tmp_path)
+    task3.aws_client.create_bucket(Bucket=BUCKET)
+    return task3
+
+
+def test_settings_are_read_when_the_cache_is_created(monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_OBJECT_CACHE_DIR", str(tmp_path / "late"))
+    monkeypatch.setenv("S3_OBJECT_CACHE_MAX_BYTES", "1234")
+    cache = ObjectCache()
+    assert cache.directory == str(tmp_path / "late")
+    assert cache.max_bytes == 1234
+
+
+def test_get_saves_under_the_key_name(task3, tmp_path):
+    task3.aws_client.put_object(Bucket=BUCKET, Key="photos/cat.jpg", Body=b"meow")
+    result = CliRunner().invoke(task3.app, ["get", BUCKET, "photos/cat.jpg"])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / "cat.jpg").read_bytes() == b"meow"
+
+
+def test_get_rejects_a_key_without_a_file_name(task3):
+    task3.aws_client.put_object(Bucket=BUCKET, Key="photos/", Body=b"")
+    result = CliRunner().invoke(task3.app, ["get", BUCKET, "photos/"])
+    assert result.exit_code == 2
+    assert "--dest" in result.output
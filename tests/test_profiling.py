@@ -0,0 +1,40 @@
+import boto3
+import pytest
+from botocore.config import Config
+from botocore.exceptions import EndpointConnectionError
+
+from task4_bonus.profiling import CallProfiler, profile_calls
+
+
+def unreachable_client():
+    # nothing listens on the discard port, so the connection is refused at once
+    return boto3.client(
+        "s3",
+        region_name="us-east-1",
+        endpoint_url="http://127.0.0.1:9",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        config=Config(connect_timeout=1, retries={"mode": "standard", "max_attempts": 1}),
+    )
+
+
+def test_connection_error_is_recorded_not_masked():
+    client = unreachable_client()
+    profiler = CallProfiler()
+    profiler.attach(client)
+
+    with pytest.raises(EndpointConnectionError):
+        client.list_buckets()
+
+    profiler.detach()
+    [call] = profiler.calls
+    assert call["operation"] == "s3.ListBuckets"
+    assert call["status"] == "EndpointConnectionError"
+    assert profiler.summary()[0]["errors"] == 1
+
+
+def test_call_trace_implies_profiling(tmp_path):
+    trace = tmp_path / "calls.jsonl"
+    with profile_calls(False, str(trace)) as profiler:
+        assert profiler is not None
+    assert trace.exists()
@@ -0,0 +1,84 @@
+import pytest
+
+from task4_bonus import ratelimit
+from task4_bonus.ratelimit import TokenBucket, parse_budgets
+
+
+class FakeClock:
+    def __init__(self):
+        # binary-exact times, so a frozen clock never leaves a token a rounding error short
+        self.now = 1024.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+def test_acquire_spends_the_burst_then_paces_at_the_rate(clock):
+    bucket = TokenBucket(rate=4, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.sleeps == [0.25] * 4
+
+
+def test_throttle_halves_the_rate_at_most_once_a_second(clock):
+    bucket = TokenBucket(rate=16, burst=10)
+    bucket.throttled()
+    bucket.throttled()
+    assert bucket.rate == 8
+    assert bucket.throttles == 2
+    # the cut also empties the bucket, so the next call waits
+    assert bucket.tokens <= 0
+
+    clock.now += 1
+    bucket.throttled()
+    assert bucket.rate == 4
+
+    for _ in range(10):
+        clock.now += 1
+        bucket.throttled()
+    assert bucket.rate == 1
+
+
+def test_success_recovers_the_rate_up_to_the_budget(clock):
+    bucket = TokenBucket(rate=10, burst=10)
+    bucket.throttled()
+    assert bucket.rate == 5
+
+    for _ in range(25):
+        bucket.succeeded()
+    assert bucket.rate == pytest.approx(10)
+    bucket.succeeded()
+    assert bucket.rate == 10
+    assert bucket.throughput() == pytest.approx(26 / bucket.window)
+
+
+def test_parse_budgets():
+    assert parse_budgets("ec2.mutating=10/50, rds.describe=20,,") == {
+        ("ec2", "mutating"): (10.0, 50.0),
+        ("rds", "describe"): (20.0, 20.0),
+    }
+    assert parse_budgets("") == {}
+
+
+def test_budget_overrides_reach_the_limiter():
+    limiter = ratelimit.RateLimiter(parse_budgets("ec2.mutating=1/2"))
+    bucket = limiter.bucket("us-east-1", "ec2", "CreateVpc")
+    assert (bucket.max_rate, bucket.burst) == (1.0, 2.0)
+    assert limiter.bucket("us-east-1", "ec2", "DescribeVpcs").max_rate == 20
+    assert limiter.bucket("us-east-1", "s3", "GetObject") is None
@@ -0,0 +1,42 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+BUCKET = "restore-test"
+
+
+@pytest.fixture
+def task3(task3):
+    task3.aws_client.create_bucket(Bucket=BUCKET)
+    task3.aws_client.put_bucket_versioning(Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"})
+    return task3
+
+
+def plan(module, at):
+    entries = module.iter_versions(module.aws_client, BUCKET, "")
+    return {key: action for action, key, _ in module.plan_restore(entries, at)}
+
+
+def test_restore_then_rerun_is_a_no_op(task3):
+    s3 = task3.aws_client
+    for key in ("a", "b", "c", "e"):
+        s3.put_object(Bucket=BUCKET, Key=key, Body=f"{key} v1".encode())
+    # deleted in the same second it was written
+    s3.delete_object(Bucket=BUCKET, Key="e")
+    time.sleep(1.1)
+    at = datetime.now(timezone.utc)
+    time.sleep(1.1)
+
+    s3.put_object(Bucket=BUCKET, Key="a", Body=b"a v2")
+    s3.delete_object(Bucket=BUCKET, Key="b")
+    s3.put_object(Bucket=BUCKET, Key="d", Body=b"d v1")
+
+    assert plan(task3, at) == {"a": "restore", "b": "restore", "c": "unchanged", "d": "delete", "e": "unchanged"}
+
+    task3.restore_prefix(BUCKET, "", at.isoformat(), apply=True, workers=4)
+
+    assert s3.get_object(Bucket=BUCKET, Key="a")["Body"].read() == b"a v1"
+    assert s3.get_object(Bucket=BUCKET, Key="b")["Body"].read() == b"b v1"
+    # d was written and deleted within the same second; the delete marker is latest
+    assert set(plan(task3, at).values()) == {"unchanged"}
@@ -0,0 +1,89 @@
+import pytest
+
+from sg_rules import apply_rules, check_quota, collapse, compile_rules, diff_rules, parse_rule
+
+
+class FakeEC2:
+    """Just enough of an EC2 client for apply_rules, recording the calls it makes."""
+
+    def __init__(self, rules=()):
+        self.rules = [
+            {'SecurityGroupRuleId': f'sgr-{i}', 'IsEgress': False, 'IpProtocol': protocol,
+             'FromPort': from_port, 'ToPort': to_port, 'CidrIpv4': cidr}
+            for i, (protocol, from_port, to_port, cidr) in enumerate(rules)
+        ]
+        self.calls = []
+
+    def get_paginator(self, name):
+        rules = self.rules
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield {'SecurityGroupRules': rules}
+
+        return Paginator()
+
+    def authorize_security_group_ingress(self, GroupId, IpPermissions):
+        self.calls.append(('authorize', [r['CidrIp'] for p in IpPermissions for r in p['IpRanges']]))
+
+    def revoke_security_group_ingress(self, GroupId, SecurityGroupRuleIds):
+        self.calls.append(('revoke', SecurityGroupRuleIds))
+
+
+def test_collapse_merges_adjacent_and_overlapping_ranges():
+    assert collapse(['10.0.0.0/25', '10.0.0.128/25', '10.0.0.7', '2001:db8::1']) == ['10.0.0.0/24', '2001:db8::1/128']
+
+
+def test_compile_rules_merges_rules_for_the_same_ports():
+    rules = [('tcp', 22, 22, ['10.0.0.0/25']), ('tcp', 22, 22, ['10.0.0.128/25']), ('tcp', 443, 443, ['1.2.3.4'])]
+    assert compile_rules(rules) == {('tcp', 22, 22): ['10.0.0.0/24'], ('tcp', 443, 443): ['1.2.3.4/32']}
+
+
+def test_diff_rules_only_touches_managed_ports():
+    desired = {('tcp', 22, 22): ['10.0.0.0/24']}
+    current = {('tcp', 22, 22): {'10.0.0.0/24': 'sgr-1', '192.0.2.0/24': 'sgr-2'}, ('tcp', 80, 80): {'0.0.0.0/0': 'sgr-3'}}
+    assert diff_rules(desired, current) == ({}, ['sgr-2'])
+
+
+def test_parse_rule():
+    assert parse_rule('tcp:8000-8080=10.0.0.0/8,192.0.2.1') == ('tcp', 8000, 8080, ['10.0.0.0/8', '192.0.2.1'])
+    assert parse_rule('-1=0.0.0.0/0') == ('-1', None, None, ['0.0.0.0/0'])
+
+
+def test_check_quota_counts_each_ip_version_separately():
+    check_quota('sg', ['10.0.0.1/32', '10.0.0.3/32', '2001:db8::1/128'], max_rules=2)
+    with pytest.raises(ValueError, match='IPv4'):
+        check_quota('sg', ['10.0.0.1/32', '10.0.0.3/32', '10.0.0.5/32'], max_rules=2)
+
+
+def test_quota_is_checked_before_any_change():
+    ec2 = FakeEC2([('tcp', 80, 80, '10.1.0.0/16')])
+    with pytest.raises(ValueError):
+        apply_rules(ec2, 'sg-1', [('tcp', 22, 22, ['10.0.0.1', '10.0.0.3'])], max_rules=2)
+    assert ec2.calls == []
+
+
+def test_authorizes_before_revoking_when_both_fit():
+    ec2 = FakeEC2([('tcp', 22, 22, '10.0.0.1/32')])
+    assert apply_rules(ec2, 'sg-1', [('tcp', 22, 22, ['10.0.0.3'])], max_rules=2) == (1, 1)
+    assert ec2.calls == [('authorize', ['10.0.0.3/32']), ('revoke', ['sgr-0'])]
+
+
+def test_revokes_first_when_the_new_rules_only_fit_afterwards():
+    ec2 = FakeEC2([('tcp', 22, 22, '10.0.0.1/32')])
+    apply_rules(ec2, 'sg-1', [('tcp', 22, 22, ['10.0.0.3'])], max_rules=1)
+    assert ec2.calls == [('revoke', ['sgr-0']), ('authorize', ['10.0.0.3/32'])]
+
+
+def test_batches_authorize_calls():
+    ec2 = FakeEC2()
+    apply_rules(ec2, 'sg-1', [('tcp', 22, 22, ['10.0.0.1', '10.0.0.3', '10.0.0.5'])], batch_size=2)
+    assert [len(cidrs) for _, cidrs in ec2.calls] == [2, 1]
+
+
+def test_rds_group_is_not_created_when_the_rules_exceed_the_quota(ec2):
+    import rds
+
+    cidrs = [f'10.0.{i}.1' for i in range(0, 200, 2)]
+    assert rds.create_security_group(ec2, 'too-many', 'test', cidrs=cidrs) is None
+    assert not ec2.describe_security_groups(Filters=[{'Name': 'group-name', 'Values': ['too-many']}])['SecurityGroups']
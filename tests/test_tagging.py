@@ -0,0 +1,13 @@
+from task4_bonus.tagging import bulk_tag
+
+
+def test_bulk_tag_isolates_unknown_ids(ec2):
+    vpc_ids = [ec2.create_vpc(CidrBlock=f"10.{i}.0.0/16")["Vpc"]["VpcId"] for i in range(4)]
+    resources = {resource_id: {"team": "infra"} for resource_id in vpc_ids[:2] + ["vpc-0000000000000dead"] + vpc_ids[2:]}
+
+    tagged, errors = bulk_tag(ec2, resources)
+
+    assert tagged == 4
+    assert len(errors) == 1 and "vpc-0000000000000dead" in errors[0]
+    described = ec2.describe_vpcs(VpcIds=vpc_ids)["Vpcs"]
+    assert all({"Key": "team", "Value": "infra"} in vpc.get("Tags", []) for vpc in described)
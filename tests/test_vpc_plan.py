@@ -0,0 +1,39 @@
+import argparse
+
+import leqcia8_davaleba
+from vpc_plan import plan_network, public_route_table, snapshot_network
+
+CIDR = "10.20.0.0/16"
+
+
+def build(subnets=2):
+    args = argparse.Namespace(vpc_cidr=CIDR, num_public_subnets=subnets, num_private_subnets=0, name="plan-test", plan=False, tag=[])
+    return leqcia8_davaleba.build_network(args)
+
+
+def test_reassociates_a_public_subnet_moved_to_another_table(ec2):
+    build()
+    snapshot = snapshot_network(ec2, CIDR, "plan-test")
+    subnet_id = snapshot["subnets"]["10.20.0.0/24"]["SubnetId"]
+    other = ec2.create_route_table(VpcId=snapshot["vpc_id"])["RouteTable"]["RouteTableId"]
+    association = next(a for t in snapshot["route_tables"] for a in t.get("Associations", []) if a.get("SubnetId") == subnet_id)
+    ec2.replace_route_table_association(AssociationId=association["RouteTableAssociationId"], RouteTableId=other)
+
+    assert [step["action"] for step in build()] == ["associate_route_table"]
+
+    snapshot = snapshot_network(ec2, CIDR, "plan-test")
+    assert plan_network(snapshot, leqcia8_davaleba.desired_subnets(CIDR, 2, 0, ["us-east-1a"])) == []
+    assert any(a.get("SubnetId") == subnet_id for a in public_route_table(snapshot)["Associations"])
+
+
+def test_create_igw_reuses_an_attached_gateway(ec2):
+    vpc_id = ec2.create_vpc(CidrBlock=CIDR)["Vpc"]["VpcId"]
+    igw_id = ec2.create_internet_gateway()["InternetGateway"]["InternetGatewayId"]
+    ec2.attach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
+    # a snapshot taken before the gateway was attached
+    stale = {"vpc_id": vpc_id, "igw_id": None, "subnets": {}, "route_tables": []}
+
+    state = leqcia8_davaleba.apply_plan(ec2, [{"action": "create_igw"}], stale, CIDR, "plan-test")
+
+    assert state["igw_id"] == igw_id
+    assert len(ec2.describe_internet_gateways()["InternetGateways"]) == 1
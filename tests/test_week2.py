@@ -0,0 +1,53 @@
+import importlib
+import json
+
+import pytest
+from botocore.exceptions import EndpointConnectionError, NoCredentialsError
+
+
+@pytest.fixture
+def week2(aws):
+    return importlib.import_module("task4_bonus.bonus_task4-week2")
+
+
+@pytest.mark.parametrize("principal, expected", [
+    ("*", "public"),
+    ({"AWS": "*"}, "public"),
+    ({"AWS": ["arn:aws:iam::123456789012:root", "*"]}, "public"),
+    ({"AWS": ["arn:aws:iam::123456789012:root"]}, "present"),
+    ({"Service": "logging.s3.amazonaws.com"}, "present"),
+])
+def test_audit_policy_flags_public_principals(week2, principal, expected):
+    s3 = week2.get_client("s3")
+    s3.create_bucket(Bucket="policy-test")
+    statement = {"Effect": "Allow", "Principal": principal, "Action": "s3:GetObject", "Resource": "arn:aws:s3:::policy-test/*"}
+    s3.put_bucket_policy(Bucket="policy-test", Policy=json.dumps({"Version": "2012-10-17", "Statement": [statement]}))
+    assert week2.audit_policy(s3, "policy-test") == expected
+
+
+def test_unreachable_region_is_reported_in_its_cell(week2, monkeypatch):
+    def unreachable(client, bucket_name):
+        raise EndpointConnectionError(endpoint_url="https://s3.ap-east-1.amazonaws.com")
+
+    monkeypatch.setitem(week2.AUDIT_CHECKS, "versioning", unreachable)
+    assert week2.run_check("any-bucket", "ap-east-1", "versioning", 4) == "error: EndpointConnectionError"
+
+
+@pytest.mark.parametrize("location, region", [(None, "us-east-1"), ("EU", "eu-west-1"), ("eu-central-1", "eu-central-1")])
+def test_bucket_region_maps_legacy_location_constraints(week2, monkeypatch, location, region):
+    class S3:
+        def get_bucket_location(self, Bucket):
+            return {"LocationConstraint": location}
+
+    monkeypatch.setattr(week2, "s3_client", S3)
+    assert week2.bucket_region("any-bucket") == region
+
+
+def test_presign_without_credentials_raises_a_clear_error(week2, monkeypatch):
+    class Session:
+        def get_credentials(self):
+            return None
+
+    monkeypatch.setattr(week2, "get_session", Session)
+    with pytest.raises(NoCredentialsError):
+        week2.presign_urls("any-bucket", region="us-east-1")
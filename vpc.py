@@ -0,0 +1,60 @@
+import logging
+from task4_bonus.tagging import tag_specifications
+
+
+def create_vpc(ec2_client, cidr_block, tags=None):
+    response = ec2_client.create_vpc(CidrBlock=cidr_block, TagSpecifications=tag_specifications('vpc', tags))
+    vpc_id = response['Vpc']['VpcId']
+    ec2_client.get_waiter('vpc_available').wait(VpcIds=[vpc_id])
+    logging.info(f"Created VPC: {vpc_id}")
+    return vpc_id
+
+
+def get_or_set_igw(ec2_client, vpc_id, tags=None):
+    """Return the gateway attached to ``vpc_id``, creating and attaching one if there is none."""
+    response = ec2_client.describe_internet_gateways(Filters=[{'Name': 'attachment.vpc-id', 'Values': [vpc_id]}])
+    if response['InternetGateways']:
+        igw_id = response['InternetGateways'][0]['InternetGatewayId']
+        logging.info(f"Using IGW {igw_id} already attached to {vpc_id}")
+        return igw_id
+
+    response = ec2_client.create_internet_gateway(TagSpecifications=tag_specifications('internet-gateway', tags))
+    igw_id = response['InternetGateway']['InternetGatewayId']
+    ec2_client.attach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
+    logging.info(f"Created IGW {igw_id} and attached it to {vpc_id}")
+    return igw_id
+
+
+def create_subnet(ec2_client, vpc_id, cidr_block, name, availability_zone, tags=None):
+    response = ec2_client.create_subnet(
+        VpcId=vpc_id,
+        CidrBlock=cidr_block,
+        AvailabilityZone=availability_zone,
+        TagSpecifications=tag_specifications('subnet', {**(tags or {}), 'Name': name})
+    )
+    subnet_id = response['Subnet']['SubnetId']
+    logging.info(f"Created subnet {name}: {subnet_id}")
+    return subnet_id
+
+
+def enable_auto_public_ips(ec2_client, subnet_id, action):
+    ec2_client.modify_subnet_attribute(SubnetId=subnet_id, MapPublicIpOnLaunch={'Value': action == 'enable'})
+    logging.info(f"Auto-assign public IPs {action}d on subnet {subnet_id}")
+
+
+def create_route_table_without_route(ec2_client, vpc_id, tags=None):
+    response = ec2_client.create_route_table(VpcId=vpc_id, TagSpecifications=tag_specifications('route-table', tags))
+    rtb_id = response['RouteTable']['RouteTableId']
+    logging.info(f"Created route table: {rtb_id}")
+    return rtb_id
+
+
+def add_route_to_igw(ec2_client, rtb_id, igw_id):
+    ec2_client.create_route(RouteTableId=rtb_id, DestinationCidrBlock='0.0.0.0/0', GatewayId=igw_id)
+    logging.info(f"Added a default route through {igw_id} to {rtb_id}")
+
+
+def associate_route_table_to_subnet(ec2_client, rtb_id, subnet_id):
+    association_id = ec2_client.associate_route_table(RouteTableId=rtb_id, SubnetId=subnet_id)['AssociationId']
+    logging.info(f"Associated route table {rtb_id} with subnet {subnet_id}")
+    return association_id
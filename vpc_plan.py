@@ -0,0 +1,93 @@
+def paginate(ec2_client, operation, result_key, **kwargs):
+    paginator = ec2_client.get_paginator(operation)
+    for page in paginator.paginate(**kwargs):
+        yield from page.get(result_key, [])
+
+def find_vpc(ec2_client, vpc_cidr, name=None):
+    filters = [{'Name': 'cidr', 'Values': [vpc_cidr]}]
+    if name:
+        filters.append({'Name': 'tag:Name', 'Values': [name]})
+    for vpc in paginate(ec2_client, 'describe_vpcs', 'Vpcs', Filters=filters):
+        if vpc['State'] in ('pending', 'available'):
+            return vpc['VpcId']
+    return None
+
+def snapshot_network(ec2_client, vpc_cidr, name=None):
+    snapshot = {
+        'vpc_id': find_vpc(ec2_client, vpc_cidr, name),
+        'igw_id': None,
+        'subnets': {},
+        'route_tables': [],
+    }
+    vpc_id = snapshot['vpc_id']
+    if not vpc_id:
+        return snapshot
+
+    vpc_filter = [{'Name': 'vpc-id', 'Values': [vpc_id]}]
+    for subnet in paginate(ec2_client, 'describe_subnets', 'Subnets', Filters=vpc_filter):
+        snapshot['subnets'][subnet['CidrBlock']] = subnet
+    snapshot['route_tables'] = list(paginate(ec2_client, 'describe_route_tables', 'RouteTables', Filters=vpc_filter))
+    snapshot['igw_id'] = find_attached_igw(ec2_client, vpc_id)
+    return snapshot
+
+def find_attached_igw(ec2_client, vpc_id):
+    for igw in paginate(ec2_client, 'describe_internet_gateways', 'InternetGateways',
+                        Filters=[{'Name': 'attachment.vpc-id', 'Values': [vpc_id]}]):
+        return igw['InternetGatewayId']
+    return None
+
+def public_route_table(snapshot):
+    igw_id = snapshot['igw_id']
+    if not igw_id:
+        return None
+    for route_table in snapshot['route_tables']:
+        for route in route_table.get('Routes', []):
+            if route.get('DestinationCidrBlock') == '0.0.0.0/0' and route.get('GatewayId') == igw_id:
+                return route_table
+    return None
+
+def subnet_association(snapshot, subnet_id):
+    """Return (route table ID, association ID) of the subnet's explicit association, or (None, None)."""
+    for route_table in snapshot['route_tables']:
+        for association in route_table.get('Associations', []):
+            if association.get('SubnetId') == subnet_id:
+                return route_table['RouteTableId'], association['RouteTableAssociationId']
+    return None, None
+
+def plan_network(snapshot, subnets):
+    plan = []
+    if not snapshot['vpc_id']:
+        plan.append({'action': 'create_vpc'})
+    if not snapshot['igw_id']:
+        plan.append({'action': 'create_igw'})
+    public_rtb = public_route_table(snapshot)
+    if not public_rtb:
+        plan.append({'action': 'create_public_route_table'})
+    public_rtb_id = public_rtb['RouteTableId'] if public_rtb else None
+
+    for subnet in subnets:
+        existing = snapshot['subnets'].get(subnet['cidr'])
+        if not existing:
+            plan.append({'action': 'create_subnet', **subnet})
+            if subnet['public']:
+                plan.append({'action': 'associate_route_table', 'cidr': subnet['cidr']})
+            continue
+        if subnet['public'] and not existing.get('MapPublicIpOnLaunch'):
+            plan.append({'action': 'enable_public_ips', 'cidr': subnet['cidr'], 'subnet_id': existing['SubnetId']})
+        route_table_id, association_id = subnet_association(snapshot, existing['SubnetId'])
+        if subnet['public'] and (not public_rtb_id or route_table_id != public_rtb_id):
+            step = {'action': 'associate_route_table', 'cidr': subnet['cidr'], 'subnet_id': existing['SubnetId']}
+            if association_id:
+                # a subnet has one explicit association, which has to be replaced
+                step['association_id'] = association_id
+            plan.append(step)
+    return plan
+
+def print_plan(plan):
+    if not plan:
+        print("Network is up to date, nothing to do.")
+        return
+    print(f"Plan: {len(plan)} change(s)")
+    for step in plan:
+        details = ', '.join(f"{key}={value}" for key, value in step.items() if key != 'action')
+        print(f"  + {step['action']}" + (f" ({details})" if details else ""))